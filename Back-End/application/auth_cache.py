@@ -0,0 +1,175 @@
+from time import monotonic, time
+from flask import current_app, g
+from flask_security import RoleMixin, UserMixin
+from flask_security.utils import config_value, get_request_attr, parse_auth_token, set_request_attr
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from application.model import db, User
+from application.sec import datastore
+from application.catalog import LRUCache
+
+
+# what an authenticated request needs before any route logic: who the token belongs to,
+# whether the account is active and which roles it has
+AUTH_PREFIX = 'auth:'
+AUTH_CACHE_TIMEOUT = 5 * 60     # shared entries, dropped on deactivation or a role change
+LOCAL_TTL = 5                   # seconds a worker trusts its own copy; bounds how late other workers see a change
+L1_MAX_ENTRIES = 1024
+
+
+class CachedRole(RoleMixin):
+    """Role name and permissions as cached; enough for @roles_required and has_role"""
+
+    def __init__(self, name, permissions=()):
+        self.name = name
+        self.permissions = list(permissions)
+
+
+class TokenUser(UserMixin):
+    """Stand-in for the User behind a cached token
+
+    id, fs_uniquifier, active and roles come from the cache, so authentication and role checks
+    run no SQL. Any other attribute (name, professional, user_address, ...) loads the User row
+    on first use and reads it from there.
+    """
+
+    def __init__(self, user_id, fs_uniquifier, active, roles):
+        self.id = user_id
+        self.fs_uniquifier = fs_uniquifier
+        self.active = active
+        self.roles = [CachedRole(name, permissions) for name, permissions in roles]
+        self._user = None
+
+    def __getattr__(self, name):
+        # only reached for attributes not set in __init__
+        if name.startswith('__') or name == '_user':
+            raise AttributeError(name)
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return getattr(self._user, name)
+
+
+class TokenCache:
+    """Token -> (user id, active flag, roles) with a per-worker LRU (L1) in front of the shared cache (L2)
+
+    L1 is keyed by the raw token, so a hit skips even the signature check; its entries expire after
+    LOCAL_TTL. L2 is keyed by the token's fs_uniquifier, so every token of one user shares an entry
+    and forget() drops them all at once.
+    """
+
+    def __init__(self, max_entries=L1_MAX_ENTRIES, local_ttl=LOCAL_TTL):
+        self.local_ttl = local_ttl
+        self._local = LRUCache(max_entries)
+
+    def lookup(self, token):
+        """(token data, entry) for a valid token, or None; entry is None for an unknown user"""
+        now = monotonic()
+        hit = self._local.get(token)
+        if hit is not None:
+            expires_at, tdata, entry = hit
+            expires = tdata.get('exp')     # 0: the token never expires
+            if now < expires_at and (not expires or expires >= time()):
+                return tdata, entry
+
+        try:
+            tdata = parse_auth_token(token)
+        except Exception:
+            return None
+
+        key = AUTH_PREFIX + tdata['uid']
+        entry = current_app.cache.get(key)
+        if entry is None:
+            user = datastore.find_user(fs_uniquifier=tdata['uid'])
+            if user is None:
+                return tdata, None
+            entry = user_entry(user)
+            current_app.cache.set(key, entry, timeout=AUTH_CACHE_TIMEOUT)
+
+        self._local.set(token, (now + self.local_ttl, tdata, entry))
+        return tdata, entry
+
+    def forget(self, *fs_uniquifiers):
+        """Drop the users' entries; other workers drop their L1 copies within LOCAL_TTL"""
+        if fs_uniquifiers:
+            current_app.cache.delete_many(*[AUTH_PREFIX + uid for uid in fs_uniquifiers])
+            self._local.clear()
+
+
+def user_entry(user):
+    return user.id, user.active, tuple((role.name, tuple(role.get_permissions())) for role in user.roles)
+
+
+token_cache = TokenCache()
+
+
+def request_token(request):
+    """The auth token the way Flask-Security looks for it: JSON body, then query string, then header"""
+    args_key = config_value('TOKEN_AUTHENTICATION_KEY')
+    token = request.args.get(args_key, request.headers.get(config_value('TOKEN_AUTHENTICATION_HEADER')))
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        if isinstance(data, dict):
+            token = data.get(args_key, token)
+    return token
+
+
+def load_user_from_token(request):
+    """Flask-Login request loader; replaces Flask-Security's, which queries the user and roles on every request"""
+    if get_request_attr('fs_authn_via') == 'token':
+        return g._login_user
+
+    token = request_token(request)
+    if not token:
+        return None
+    found = token_cache.lookup(token)
+    if found is None or found[1] is None:
+        return None
+
+    tdata, (user_id, active, roles) = found
+    user = TokenUser(user_id, tdata['uid'], active, roles)
+    if not (user.active and user.verify_auth_token(tdata)):
+        return None
+
+    set_request_attr('fs_authn_via', 'token')
+    if config_value('FRESHNESS_ALLOW_AUTH_TOKEN'):
+        set_request_attr('fs_paa', tdata.get('fs_paa', 0))
+    return user
+
+
+# cached entries go stale when a user is (de)activated, changes roles or gets a new uniquifier
+# (which voids all their tokens); they are dropped once the change is committed
+
+def _mark_stale(user, fs_uniquifier=None):
+    session = object_session(user)
+    if session is not None and (fs_uniquifier or user.fs_uniquifier):
+        session.info.setdefault('stale_auth', set()).add(fs_uniquifier or user.fs_uniquifier)
+
+
+@event.listens_for(User.active, 'set')
+def _active_changed(user, value, oldvalue, initiator):
+    if value != oldvalue:
+        _mark_stale(user)
+
+
+@event.listens_for(User.fs_uniquifier, 'set')
+def _uniquifier_changed(user, value, oldvalue, initiator):
+    if isinstance(oldvalue, str) and value != oldvalue:
+        _mark_stale(user, oldvalue)
+
+
+@event.listens_for(User.roles, 'append')
+@event.listens_for(User.roles, 'remove')
+def _roles_changed(user, role, initiator):
+    _mark_stale(user)
+
+
+@event.listens_for(Session, 'after_commit')
+def _forget_stale(session):
+    stale = session.info.pop('stale_auth', None)
+    if stale:
+        token_cache.forget(*stale)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_stale(session, previous_transaction):
+    session.info.pop('stale_auth', None)
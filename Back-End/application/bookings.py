@@ -0,0 +1,63 @@
+from sqlalchemy import event, select
+from application.model import db, BookingView, ServiceRequest, Service, Professional, User
+
+
+view = BookingView.__table__
+
+COLUMNS = ['id', 'user_id', 'service_id', 'service_name', 'total_price', 'remarks', 'status',
+           'professional_id', 'professional_name', 'request_date', 'completition_date', 'dispatch_hops']
+
+
+def _source():
+    """The booking rows as the view stores them, built from the normalized tables"""
+    return (
+        select(ServiceRequest.id, ServiceRequest.user_id, ServiceRequest.service_id, Service.name,
+               ServiceRequest.total_price, ServiceRequest.remarks, ServiceRequest.status,
+               ServiceRequest.professional_id, User.name, ServiceRequest.request_date,
+               ServiceRequest.completition_date, ServiceRequest.dispatch_hops)
+        .join(Service, Service.id == ServiceRequest.service_id)
+        .outerjoin(Professional, Professional.id == ServiceRequest.professional_id)
+        .outerjoin(User, User.id == Professional.user_id)
+    )
+
+
+def refresh_bookings(connection, service_request_ids):
+    """Rewrite the view rows of the given service requests from their current state
+
+    ORM writes are picked up by the mapper events below; call this directly after bulk
+    UPDATE statements on service_request, on the same connection before committing.
+    """
+    service_request_ids = list(service_request_ids)
+    if not service_request_ids:
+        return
+    connection.execute(view.delete().where(view.c.id.in_(service_request_ids)))
+    connection.execute(view.insert().from_select(COLUMNS, _source().where(ServiceRequest.id.in_(service_request_ids))))
+
+
+def rebuild_bookings(connection):
+    """Repopulate the whole view, used to backfill it or to repair it after raw SQL writes"""
+    connection.execute(view.delete())
+    connection.execute(view.insert().from_select(COLUMNS, _source()))
+
+
+def _service_request_written(mapper, connection, target):
+    refresh_bookings(connection, [target.id])
+
+
+def _service_renamed(mapper, connection, target):
+    if db.inspect(target).attrs.name.history.has_changes():
+        connection.execute(view.update().where(view.c.service_id == target.id).values(service_name=target.name))
+
+
+def _user_renamed(mapper, connection, target):
+    if db.inspect(target).attrs.name.history.has_changes():
+        professional_ids = select(Professional.id).where(Professional.user_id == target.id)
+        connection.execute(view.update().where(view.c.professional_id.in_(professional_ids))
+                           .values(professional_name=target.name))
+
+
+# booked, cancelled, assigned, re-dispatched and completed all flush the ServiceRequest
+event.listen(ServiceRequest, 'after_insert', _service_request_written)
+event.listen(ServiceRequest, 'after_update', _service_request_written)
+event.listen(Service, 'after_update', _service_renamed)
+event.listen(User, 'after_update', _user_renamed)
@@ -0,0 +1,180 @@
+from functools import wraps
+from math import log
+from random import random
+from time import sleep, time
+from uuid import uuid4
+from flask import current_app, make_response, request
+from flask_security import current_user
+
+
+# entries are dropped by tag invalidation on every write, so they can live for hours
+USER_CACHE_TIMEOUT = 6 * 60 * 60
+
+TAG_PREFIX = 'tag:'
+LOCK_PREFIX = 'lock:'
+
+EARLY_REFRESH_BETA = 1.0    # > 1 refreshes earlier, < 1 later
+STALE_GRACE = 60            # seconds an expired entry is still served while one worker rebuilds it
+LOCK_TIMEOUT = 10           # upper bound on a rebuild; a crashed worker's lock expires after this
+WAIT_INTERVAL = 0.05
+
+
+def tag_versions(*tags):
+    """Current version of each tag, creating a fresh one for tags that were never set or were evicted"""
+    cache = current_app.cache
+    keys = [TAG_PREFIX + tag for tag in tags]
+    versions = cache.get_many(*keys)
+    if None in versions:
+        for key, version in zip(keys, versions):
+            if version is None:
+                cache.add(key, uuid4().hex, timeout=0)     # add: a concurrent reader may have set it first
+        versions = cache.get_many(*keys)
+    return versions
+
+
+def invalidate(*tags):
+    """Move the tags to new versions, so every entry cached under the old ones is never read again
+
+    Tags are random tokens rather than counters, so an evicted tag cannot come back as a version
+    some stale entry was stored under.
+    """
+    if tags:
+        current_app.cache.set_many({TAG_PREFIX + tag: uuid4().hex for tag in tags}, timeout=0)
+
+
+def bookings_tag(user_id):
+    return f'bookings:{user_id}'
+
+
+def address_tag(user_id):
+    return f'address:{user_id}'
+
+
+def profile_tag(user_id):
+    return f'profile:{user_id}'
+
+
+def requests_tag(user_id):
+    return f'requests:{user_id}'
+
+
+def cached_per_user(*tag_builders, shared_tags=(), timeout=USER_CACHE_TIMEOUT):
+    """Cache a view's 200 responses per authenticated user, until one of its tags is invalidated
+
+    tag_builders take the user id and return a tag (bookings_tag, profile_tag, ...). The key holds
+    the user id, the current tag versions and the query string, so one user never reads another
+    user's entry and a write only has to bump a tag. shared_tags are the same for every user, for
+    data many users' responses carry (catalog.CATALOG_TAG for service, category and city names),
+    so one bump drops all of them. Goes below @auth_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.cache
+            user_id = current_user.id
+            versions = tag_versions(*[build(user_id) for build in tag_builders], *shared_tags)
+            key = 'user_view:%s.%s:%s:%s:%s' % (view.__module__, view.__name__, user_id, ':'.join(versions),
+                                                request.query_string.decode())
+
+            response = cache.get(key)
+            if response is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    cache.set(key, response, timeout=timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_entry(value, timeout, cost=0):
+    """What cached_call stores: the value, when it expires and what it cost to compute"""
+    return value, time() + timeout, cost
+
+
+def cached_call(key, compute, timeout):
+    """compute() cached under key, rebuilt by one worker at a time
+
+    Entries hold (value, expires_at, cost of the last compute). Every read refreshes early with a
+    probability that grows as expiry nears and with the cost of the rebuild (XFetch), so a hot key
+    is normally rebuilt by a single reader before it expires. The rebuild takes a lock with
+    cache.add; while it is held the other workers keep serving the stale value, or, on a cold key,
+    wait for the lock holder's result instead of running the same queries. A waiter that sees the
+    lock released without a result (the holder raised) takes the lock over and rebuilds itself.
+    """
+    cache = current_app.cache
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires_at, cost = entry
+        if time() - cost * EARLY_REFRESH_BETA * log(1 - random()) < expires_at:
+            return value
+
+    lock_key = LOCK_PREFIX + key
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        return _rebuild(key, lock_key, compute, timeout)
+
+    if entry is not None:
+        return entry[0]
+
+    deadline = time() + LOCK_TIMEOUT
+    while time() < deadline:
+        sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            return _rebuild(key, lock_key, compute, timeout)
+    return compute()    # the lock holder is stuck and the lock has not expired yet, do not wait any longer
+
+
+def _rebuild(key, lock_key, compute, timeout):
+    """Run compute() and store its entry; the caller holds lock_key, which is released either way"""
+    cache = current_app.cache
+    try:
+        started = time()
+        value = compute()
+        cache.set(key, cache_entry(value, timeout, time() - started), timeout=timeout + STALE_GRACE)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+class Uncacheable(Exception):
+    """Raised from a cached view's rebuild when the view did not answer 200"""
+
+    def __init__(self, response):
+        super().__init__(response.status_code)
+        self.response = response
+
+
+def render_cacheable(view, *args, **kwargs):
+    """(body, mimetype) of a view's 200 response; any other response is raised as Uncacheable"""
+    response = make_response(view(*args, **kwargs))
+    if response.status_code != 200:
+        raise Uncacheable(response)
+    return response.get_data(), response.mimetype
+
+
+def cached_view(timeout):
+    """Drop-in for @cache.cached with single-flight rebuilds and early refresh, keyed by path and query string"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                body, mimetype = cached_call('view:' + request.full_path,
+                                             lambda: render_cacheable(view, *args, **kwargs), timeout)
+            except Uncacheable as e:
+                return e.response
+            return current_app.response_class(body, mimetype=mimetype)
+        return wrapper
+    return decorator
+
+
+def memoized(timeout):
+    """Drop-in for @cache.memoize with single-flight rebuilds and early refresh"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            key = 'memo:%s.%s:%r:%r' % (f.__module__, f.__name__, args, sorted(kwargs.items()))
+            return cached_call(key, lambda: f(*args, **kwargs), timeout)
+        return wrapper
+    return decorator
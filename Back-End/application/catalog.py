@@ -0,0 +1,215 @@
+import gzip
+import json
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from time import monotonic
+from flask import current_app, request
+from application.model import db, Category, Location, Service, ServiceLocation
+from application.caching import tag_versions, invalidate, cached_call, cache_entry, render_cacheable, Uncacheable
+from application.caching import STALE_GRACE
+
+
+# locations, categories, services and serviceability: read on every page, edited by admins only
+CATALOG_TAG = 'catalog'
+CATALOG_TIMEOUT = 24 * 60 * 60      # entries are keyed by the catalog version, so they never go stale
+VERSION_POLL_INTERVAL = 1.0         # seconds a worker trusts its last read of the version
+L1_MAX_ENTRIES = 256
+
+
+class LRUCache:
+    """Bounded in-process mapping that evicts the least recently used entry"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CatalogCache:
+    """Per-worker LRU (L1) in front of the shared flask_caching backend (L2) for catalog data
+
+    Both tiers are keyed by the catalog version. The version lives in the shared cache and is
+    re-read at most once per VERSION_POLL_INTERVAL, so an admin edit in any worker reaches every
+    other worker within a second, and in between a hit costs no network round trip at all.
+    """
+
+    def __init__(self, max_entries=L1_MAX_ENTRIES, poll_interval=VERSION_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._local = LRUCache(max_entries)
+        self._version = None
+        self._checked_at = None
+
+    def version(self):
+        now = monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.poll_interval:
+            version = tag_versions(CATALOG_TAG)[0]
+            if version != self._version:
+                self._local.clear()
+                self._version = version
+            self._checked_at = now
+        return self._version
+
+    def get_or_build(self, key, build, timeout=CATALOG_TIMEOUT):
+        """Value for key from L1, else L2, else build(); concurrent misses on L2 run build() once"""
+        version = self.version()
+
+        # L1 entries carry the version they were stored under, so a late write from an older version is ignored
+        entry = self._local.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        value = cached_call(f'catalog:{version}:{key}', build, timeout)
+        self._local.set(key, (version, value))
+        return value
+
+    def put_many(self, costed_values, version, timeout=CATALOG_TIMEOUT):
+        """Store {key: (value, cost)} built for version in both tiers, L2 in one pipelined set_many"""
+        for key, (value, _) in costed_values.items():
+            self._local.set(key, (version, value))
+        current_app.cache.set_many({f'catalog:{version}:{key}': cache_entry(value, timeout, cost)
+                                    for key, (value, cost) in costed_values.items()},
+                                   timeout=timeout + STALE_GRACE)
+
+    def bump(self):
+        """Start a new catalog version after an admin edit; every worker drops its L1 on its next poll"""
+        invalidate(CATALOG_TAG)
+        self._local.clear()
+        self._checked_at = None
+
+
+class Serviceability:
+    """Which categories are served where, as one int bitmask per location
+
+    Bit c of a location's mask is set when category c has an active ServiceLocation row there.
+    The masks are rebuilt from two queries whenever the catalog version changes; in between a
+    serviceability check is a single bit test and listing a location's categories needs no SQL.
+    """
+
+    def __init__(self):
+        self._version = None
+        self._masks = {}
+        self._category_names = {}
+
+    def _ensure_fresh(self):
+        version = catalog_cache.version()
+        if version != self._version:
+            self._rebuild(version)
+
+    def _rebuild(self, version):
+        masks = {}
+        rows = db.session.query(ServiceLocation.location_id, ServiceLocation.category_id).filter(
+            ServiceLocation.active == True).all()
+        for location_id, category_id in rows:
+            masks[location_id] = masks.get(location_id, 0) | (1 << category_id)
+
+        category_names = dict(db.session.query(Category.id, Category.name).all())
+
+        # swap in complete structures so concurrent readers never see a half built one
+        self._masks, self._category_names, self._version = masks, category_names, version
+
+    def is_served(self, location_id, category_id):
+        self._ensure_fresh()
+        return bool(self._masks.get(location_id, 0) >> category_id & 1)
+
+    def categories(self, location_id):
+        """[(category id, name)] served at the location, by category id"""
+        self._ensure_fresh()
+        mask, names = self._masks.get(location_id, 0), self._category_names
+        categories = []
+        category_id = 0
+        while mask:
+            if mask & 1:
+                categories.append((category_id, names.get(category_id)))
+            mask >>= 1
+            category_id += 1
+        return categories
+
+    def matrix(self):
+        """{location id: [category ids]} for every location that serves anything"""
+        self._ensure_fresh()
+        return {location_id: [category_id for category_id, _ in self.categories(location_id)]
+                for location_id in self._masks}
+
+
+catalog_cache = CatalogCache()
+serviceability = Serviceability()
+
+
+def bump_catalog_version():
+    catalog_cache.bump()
+
+
+def _validated(response, version):
+    # clients may keep the body but must check the ETag with us before reusing it
+    response.set_etag(version)
+    response.cache_control.no_cache = True
+    return response
+
+
+def catalog_cached(view):
+    """Serve a catalog view from the two-tier cache, keyed by path and query string
+
+    Responses carry a strong ETag of the catalog version. A request whose If-None-Match holds
+    the current version gets a 304 before the cache or the view is touched.
+    Only the body of 200 responses is stored; every hit builds a fresh response around it.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = catalog_cache.version()
+        if request.if_none_match.contains(version):
+            return _validated(current_app.response_class(status=304), version)
+
+        try:
+            body, mimetype = catalog_cache.get_or_build(request.full_path,
+                                                        lambda: render_cacheable(view, *args, **kwargs))
+        except Uncacheable as e:
+            return e.response
+
+        return _validated(current_app.response_class(body, mimetype=mimetype), version)
+    return wrapper
+
+
+def _build_bundle(version):
+    categories = Category.query.filter_by(active=True).order_by(Category.name).all()
+    active_categories = {c.id for c in categories}
+    return {
+        "version": version,
+        "locations": [{"id": l.id, "city": l.city, "state": l.state}
+                      for l in Location.query.filter_by(active=True).order_by(Location.city).all()],
+        "categories": [{"id": c.id, "name": c.name, "description": c.description, "image_url": c.image_url}
+                       for c in categories],
+        "services": [{"id": s.id, "name": s.name, "description": s.description, "image_url": s.image_url,
+                      "base_price": s.base_price, "category_id": s.category_id}
+                     for s in Service.query.filter_by(active=True).order_by(Service.name).all()],
+        "serviceability": {location_id: [c for c in category_ids if c in active_categories]
+                           for location_id, category_ids in serviceability.matrix().items()},
+    }
+
+
+def build_catalog_bundle():
+    raw = json.dumps(_build_bundle(catalog_cache.version()), separators=(',', ':')).encode()
+    return raw, gzip.compress(raw)
+
+
+def catalog_bundle():
+    """(json bytes, gzip bytes) of the whole catalog, built and compressed once per catalog version"""
+    return catalog_cache.get_or_build('bundle', build_catalog_bundle)
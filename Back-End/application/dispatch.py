@@ -0,0 +1,451 @@
+from collections import deque
+from datetime import datetime
+from heapq import heappush, heappop, heapify
+from itertools import count
+from threading import Lock
+from time import monotonic
+from sqlalchemy import update
+from sqlalchemy.sql import func
+from application.model import db, IST, User, Professional, Service, ServiceRequest, AssignRequest, StatusEnum
+from application.bookings import refresh_bookings
+from application.caching import invalidate, bookings_tag, requests_tag
+
+
+# other workers toggle professionals too, so every index is rebuilt from the database after this many seconds
+REBUILD_INTERVAL = 60
+
+# a rejected request is offered to at most this many further professionals before it is given up
+MAX_DISPATCH_HOPS = 3
+
+# candidates tried when other workers keep winning the race for the best professional
+ASSIGN_RETRIES = 3
+
+# assignments that still occupy a professional
+OPEN_STATUSES = (StatusEnum.ASSIGNED, StatusEnum.ACCEPTED)
+
+
+def is_dispatchable(professional):
+    """A professional can take new work only when active, available and verified"""
+    return bool(
+        professional.available
+        and professional.status == 'verified'
+        and professional.user is not None
+        and professional.user.active
+    )
+
+
+class ProfessionalState:
+    """Precomputed per-professional inputs for scoring"""
+    __slots__ = ('rating', 'experience', 'open_requests')
+
+    def __init__(self, rating, experience, open_requests=0):
+        self.rating = rating if rating is not None else 0
+        self.experience = experience if experience is not None else 0
+        self.open_requests = open_requests
+
+
+class WeightedScorer:
+    """Default scorer: higher rating and experience win, every open request costs load_weight"""
+
+    def __init__(self, rating_weight=1.0, experience_weight=0.1, load_weight=1.5, max_experience=10):
+        self.rating_weight = rating_weight
+        self.experience_weight = experience_weight
+        self.load_weight = load_weight
+        self.max_experience = max_experience
+
+    def __call__(self, state):
+        return (
+            self.rating_weight * state.rating
+            + self.experience_weight * min(state.experience, self.max_experience)
+            - self.load_weight * state.open_requests
+        )
+
+
+class DispatchIndex:
+    """In-memory (location_id, category_id) -> ranked professionals map used to match bookings without a table scan
+
+    Each bucket is a max-heap on score with lazy deletion: a rescored professional gets a new
+    entry and older entries are skipped when they surface, so picking the best candidate is
+    O(log n) and never walks the bucket.
+    """
+
+    def __init__(self, scorer=None):
+        self.scorer = scorer or WeightedScorer()
+        self._buckets = {}          # (location_id, category_id) -> heap of (-score, seq, professional_id)
+        self._keys = {}             # professional_id -> bucket key it currently sits in
+        self._state = {}            # professional_id -> ProfessionalState
+        self._live = {}             # professional_id -> seq of its current heap entry
+        self._compact_at = {}       # bucket key -> heap size that triggers the next compaction
+        self._seq = count()
+        self._built_at = None
+        self._lock = Lock()
+
+    def set_scorer(self, scorer):
+        """Swap the ranking function; every bucket is re-ranked on the next build"""
+        self.scorer = scorer
+        self._built_at = None
+
+    def build(self):
+        rows = (
+            db.session.query(Professional.id, Professional.location_id, Professional.category_id,
+                             Professional.rating, Professional.experience)
+            .join(User, User.id == Professional.user_id)
+            .filter(User.active == True, Professional.available == True, Professional.status == 'verified')
+            .all()
+        )
+        open_counts = dict(
+            db.session.query(AssignRequest.professional_id, func.count(AssignRequest.id))
+            .filter(AssignRequest.status.in_(OPEN_STATUSES))
+            .group_by(AssignRequest.professional_id)
+            .all()
+        )
+
+        with self._lock:
+            self._buckets, self._keys, self._state, self._live, self._compact_at = {}, {}, {}, {}, {}
+            for professional_id, location_id, category_id, rating, experience in rows:
+                key = (location_id, category_id)
+                self._keys[professional_id] = key
+                self._state[professional_id] = ProfessionalState(rating, experience, open_counts.get(professional_id, 0))
+                self._buckets.setdefault(key, [])
+                self._push(professional_id)
+            self._built_at = monotonic()
+
+    def _ensure_fresh(self):
+        if self._built_at is None or monotonic() - self._built_at > REBUILD_INTERVAL:
+            self.build()
+
+    def _push(self, professional_id):
+        key = self._keys[professional_id]
+        heap = self._buckets[key]
+        seq = next(self._seq)
+        self._live[professional_id] = seq
+        heappush(heap, (-self.scorer(self._state[professional_id]), seq, professional_id))
+
+        # stale entries pile up as professionals are rescored, drop them whenever the heap doubles
+        if len(heap) > self._compact_at.get(key, 64):
+            heap[:] = [entry for entry in heap if self._live.get(entry[2]) == entry[1]]
+            heapify(heap)
+            self._compact_at[key] = max(64, 2 * len(heap))
+
+    def _discard(self, professional_id):
+        # the heap keeps the dead entry until it surfaces in _top or is compacted away
+        self._keys.pop(professional_id, None)
+        self._live.pop(professional_id, None)
+
+    def _count_open(self, professional_id):
+        return (
+            db.session.query(func.count(AssignRequest.id))
+            .filter(AssignRequest.professional_id == professional_id, AssignRequest.status.in_(OPEN_STATUSES))
+            .scalar()
+        )
+
+    def sync(self, professional):
+        """Re-file a professional after any change to availability, status, activation, rating, location or category"""
+        if self._built_at is None:
+            return  # nothing indexed yet, the first lookup builds from the database
+
+        dispatchable = is_dispatchable(professional)
+        state = self._state.get(professional.id)
+        if dispatchable and state is None:
+            open_requests = self._count_open(professional.id)
+        else:
+            open_requests = state.open_requests if state else 0
+
+        with self._lock:
+            self._discard(professional.id)
+            if dispatchable:
+                key = (professional.location_id, professional.category_id)
+                self._state[professional.id] = ProfessionalState(professional.rating, professional.experience, open_requests)
+                self._keys[professional.id] = key
+                self._buckets.setdefault(key, [])
+                self._push(professional.id)
+            else:
+                self._state.pop(professional.id, None)
+
+    def remove(self, professional_id):
+        with self._lock:
+            self._discard(professional_id)
+            self._state.pop(professional_id, None)
+
+    def _adjust_load(self, professional_id, delta):
+        with self._lock:
+            state = self._state.get(professional_id)
+            if state is None:
+                return
+            state.open_requests = max(0, state.open_requests + delta)
+            if professional_id in self._keys:
+                self._push(professional_id)
+
+    def assigned(self, professional_id):
+        """Record a new open assignment so the professional ranks lower"""
+        self._adjust_load(professional_id, 1)
+
+    def released(self, professional_id):
+        """Record an assignment leaving the open states (rejected, completed)"""
+        self._adjust_load(professional_id, -1)
+
+    def _top(self, key, exclude=()):
+        heap = self._buckets.get(key)
+        skipped, found = [], None
+        while heap:
+            _, seq, professional_id = heap[0]
+            if self._live.get(professional_id) != seq or self._keys.get(professional_id) != key:
+                heappop(heap)
+            elif professional_id in exclude:
+                skipped.append(heappop(heap))  # still valid for other requests, put back below
+            else:
+                found = professional_id
+                break
+        for entry in skipped:
+            heappush(heap, entry)
+        return found
+
+    def peek(self, location_id, category_id, exclude=()):
+        """Best ranked professional id for the key straight from the index, without a database round trip"""
+        self._ensure_fresh()
+        with self._lock:
+            return self._top((location_id, category_id), exclude)
+
+    def find(self, location_id, category_id, exclude=()):
+        """Return the best ranked dispatchable Professional for the key, or None
+
+        Professionals whose ids are in exclude are skipped, at O(log n) each.
+        """
+        self._ensure_fresh()
+        key = (location_id, category_id)
+
+        while True:
+            with self._lock:
+                professional_id = self._top(key, exclude)
+            if professional_id is None:
+                return None
+
+            # the index may be stale if another worker changed this professional, confirm against the row
+            professional = db.session.get(Professional, professional_id)
+            if professional is not None and is_dispatchable(professional) \
+                    and (professional.location_id, professional.category_id) == key:
+                return professional
+
+            if professional is None:
+                self.remove(professional_id)
+            else:
+                self.sync(professional)
+
+
+class Waitlist:
+    """FIFO of unassigned ServiceRequest ids per (location_id, category_id)
+
+    A key is loaded from the database the first time it is touched and again after
+    REBUILD_INTERVAL, so requests queued by other workers are not lost; anything still
+    missed is picked up by the periodic assign_pending_service_requests sweep.
+    """
+
+    def __init__(self):
+        self._queues = {}           # (location_id, category_id) -> deque of service request ids
+        self._loaded_at = {}        # (location_id, category_id) -> monotonic time of the last load
+        self._lock = Lock()
+
+    def _load(self, key):
+        location_id, category_id = key
+        ids = (
+            db.session.query(ServiceRequest.id)
+            .join(Service, Service.id == ServiceRequest.service_id)
+            .filter(ServiceRequest.status == StatusEnum.PENDING,
+                    ServiceRequest.location_id == location_id,
+                    Service.category_id == category_id)
+            .order_by(ServiceRequest.id)
+            .all()
+        )
+        with self._lock:
+            self._queues[key] = deque(request_id for request_id, in ids)
+            self._loaded_at[key] = monotonic()
+
+    def _ensure_loaded(self, key):
+        loaded_at = self._loaded_at.get(key)
+        if loaded_at is None or monotonic() - loaded_at > REBUILD_INTERVAL:
+            self._load(key)
+
+    def push(self, location_id, category_id, request_id):
+        key = (location_id, category_id)
+        if key not in self._loaded_at:
+            self._load(key)  # the committed request is part of the load
+            return
+        with self._lock:
+            self._queues[key].append(request_id)
+
+    def pop(self, location_id, category_id):
+        """Oldest queued request id for the key, or None; the caller must confirm it is still PENDING"""
+        key = (location_id, category_id)
+        self._ensure_loaded(key)
+        with self._lock:
+            queue = self._queues[key]
+            return queue.popleft() if queue else None
+
+    def requeue(self, location_id, category_id, request_ids):
+        """Put popped ids back at the head of the queue, keeping their order"""
+        with self._lock:
+            self._queues[(location_id, category_id)].extendleft(reversed(request_ids))
+
+
+def claim(professional):
+    """Bump the professional's assignment counter, guarded by the value that was read
+
+    Two transactions that picked the same professional from the same read cannot both
+    succeed: the loser updates no row and gets False back, with its transaction intact.
+    A professional who went unavailable or lost verification meanwhile is not claimed either.
+    The counter is separate from version_id, so assignments never make a concurrent
+    profile or status edit of the same row fail as stale.
+    """
+    return db.session.execute(
+        update(Professional)
+        .where(Professional.id == professional.id, Professional.assign_version == professional.assign_version,
+               Professional.available == True, Professional.status == 'verified')
+        .values(assign_version=Professional.assign_version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def pick_and_claim(location_id, category_id, exclude=()):
+    """Best available professional for the key, claimed in the current transaction, or None"""
+    exclude = set(exclude)
+    for _ in range(ASSIGN_RETRIES):
+        professional = dispatch_index.find(location_id, category_id, exclude=exclude)
+        if professional is None or claim(professional):
+            return professional
+
+        # another worker assigned them after we read the row, account for it and try the next one
+        dispatch_index.assigned(professional.id)
+        exclude.add(professional.id)
+    return None
+
+
+def create_booking(user_id, service, location_id, price, remarks):
+    """Insert a ServiceRequest and assign it to the best professional in a single transaction
+
+    Returns (booking, professional); professional is None when the booking was waitlisted.
+    """
+    professional = pick_and_claim(location_id, service.category_id)
+
+    booking = ServiceRequest(
+        user_id=user_id,
+        service_id=service.id,
+        location_id=location_id,
+        professional_id=professional.id if professional else None,
+        total_price=price,
+        remarks=remarks,
+        status=StatusEnum.ASSIGNED if professional else StatusEnum.PENDING
+    )
+    db.session.add(booking)
+    db.session.flush()
+
+    if professional:
+        db.session.add(AssignRequest(service_request_id=booking.id, professional_id=professional.id, status=StatusEnum.ASSIGNED))
+
+    db.session.commit()
+
+    if professional:
+        dispatch_index.assigned(professional.id)
+    else:
+        # queue it for the next professional who becomes available here
+        waitlist.push(location_id, service.category_id, booking.id)
+
+    return booking, professional
+
+
+def rejected_by(service_request_ids):
+    """Map each service request id to the professionals who already turned it down
+
+    One query for any number of requests, served by the (service_request_id, professional_id) index.
+    """
+    rejected = {}
+    rows = (
+        db.session.query(AssignRequest.service_request_id, AssignRequest.professional_id)
+        .filter(AssignRequest.service_request_id.in_(service_request_ids),
+                AssignRequest.status == StatusEnum.REJECTED)
+        .all()
+    )
+    for service_request_id, professional_id in rows:
+        rejected.setdefault(service_request_id, set()).add(professional_id)
+    return rejected
+
+
+def redispatch(service_request):
+    """Offer a just rejected request to the next best professional who has not rejected it yet
+
+    Every call counts as one hop on service_request.dispatch_hops. After MAX_DISPATCH_HOPS the
+    request is marked REJECTED; when nobody else is available it goes back to PENDING for the
+    waitlist. Returns the new Professional or None. The caller commits.
+    """
+    service_request.dispatch_hops = (service_request.dispatch_hops or 0) + 1
+    if service_request.dispatch_hops > MAX_DISPATCH_HOPS:
+        service_request.status = StatusEnum.REJECTED
+        return None
+
+    exclude = rejected_by([service_request.id]).get(service_request.id, set())
+    professional = pick_and_claim(service_request.location_id, service_request.service.category_id, exclude=exclude)
+
+    if professional is None:
+        service_request.professional_id = None
+        service_request.status = StatusEnum.PENDING
+        return None
+
+    service_request.professional_id = professional.id
+    service_request.status = StatusEnum.ASSIGNED
+    db.session.add(AssignRequest(service_request_id=service_request.id, professional_id=professional.id,
+                                 status=StatusEnum.ASSIGNED, assign_date=datetime.now(IST)))
+    return professional
+
+
+def assign_waitlisted(professional):
+    """Give the head of the professional's waitlist to them as soon as they become dispatchable
+
+    Returns the id of the assigned ServiceRequest, or None when nothing was waiting.
+    """
+    if not is_dispatchable(professional):
+        return None
+
+    skipped = []
+    try:
+        while True:
+            request_id = waitlist.pop(professional.location_id, professional.category_id)
+            if request_id is None:
+                return None
+
+            # requests this professional already rejected stay queued for someone else
+            if professional.id in rejected_by([request_id]).get(request_id, ()):
+                skipped.append(request_id)
+                continue
+
+            # lost the professional to a concurrent assignment, the request waits for the next one
+            if not claim(professional):
+                db.session.rollback()
+                skipped.append(request_id)
+                return None
+
+            # cancelled or already assigned requests are dropped from the queue here
+            customer_id = db.session.execute(
+                update(ServiceRequest)
+                .where(ServiceRequest.id == request_id, ServiceRequest.status == StatusEnum.PENDING)
+                .values(professional_id=professional.id, status=StatusEnum.ASSIGNED,
+                        version_id=ServiceRequest.version_id + 1)
+                .returning(ServiceRequest.user_id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+            if customer_id is None:
+                db.session.rollback()
+                continue
+
+            db.session.add(AssignRequest(service_request_id=request_id, professional_id=professional.id,
+                                         status=StatusEnum.ASSIGNED, assign_date=datetime.now(IST)))
+            refresh_bookings(db.session.connection(), [request_id])    # the bulk UPDATE bypasses the mapper events
+            db.session.commit()
+            dispatch_index.assigned(professional.id)
+            invalidate(bookings_tag(customer_id), requests_tag(professional.user_id))
+            return request_id
+    finally:
+        if skipped:
+            waitlist.requeue(professional.location_id, professional.category_id, skipped)
+
+
+dispatch_index = DispatchIndex()
+waitlist = Waitlist()
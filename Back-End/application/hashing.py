@@ -0,0 +1,72 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# werkzeug's current default; hashes stored with other parameters are upgraded on the next login
+PASSWORD_METHOD = 'scrypt:32768:8:1'
+RETRY_AFTER = 1     # seconds, sent with the 503 when the pool is saturated
+
+
+class HashingBusy(Exception):
+    """Every hashing worker is busy and the queue in front of them is full"""
+
+
+class HashingPool:
+    """Password hashing in a fixed number of worker processes, with a bounded queue in front
+
+    A hash takes tens of milliseconds of CPU; run in the request thread it holds the GIL and the
+    WSGI worker for that long, so a burst of logins slows every other endpoint down. Here at most
+    PASSWORD_HASH_WORKERS hashes run at a time, at most PASSWORD_HASH_QUEUE more wait, and any
+    request beyond that is refused at once with HashingBusy instead of queueing without bound.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                workers = current_app.config['PASSWORD_HASH_WORKERS']
+                self._slots = BoundedSemaphore(workers + current_app.config['PASSWORD_HASH_QUEUE'])
+                # spawn: forking a threaded server can copy locks held by other threads into the workers
+                self._executor = ProcessPoolExecutor(workers, mp_context=get_context('spawn'))
+
+    def run(self, fn, *args):
+        if self._executor is None:
+            self._start()
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            self._executor = None   # a worker died; start a fresh pool on the next call
+            raise
+
+
+hashing_pool = HashingPool()
+
+
+def hash_password(password):
+    return hashing_pool.run(generate_password_hash, password, PASSWORD_METHOD)
+
+
+def verify_password(password_hash, password):
+    return hashing_pool.run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return not password_hash.startswith(PASSWORD_METHOD + '$')
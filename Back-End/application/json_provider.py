@@ -0,0 +1,76 @@
+import json
+from datetime import date
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:     # the stdlib provider below produces the same output, only slower
+    orjson = None
+
+
+def encode_default(o):
+    """Types neither encoder handles on its own; datetimes go out as ISO 8601 from both providers"""
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, Decimal):
+        return str(o)
+    return DefaultJSONProvider.default(o)     # uuid, dataclasses, markup; TypeError for the rest
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider, with ISO 8601 datetimes instead of HTTP dates"""
+
+    @staticmethod
+    def default(o):
+        return encode_default(o)
+
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson
+
+    orjson encodes datetime, date, enums (by value, so StatusEnum.PENDING is "pending") and
+    dataclasses itself, in Rust; Decimal and markup go through default(). Keys are sorted and
+    responses indented in debug mode, as with Flask's provider. Calls that pass json.dumps
+    keyword arguments fall back to the stdlib.
+    """
+
+    sort_keys = True
+    compact = None
+    mimetype = 'application/json'
+
+    @staticmethod
+    def default(o):
+        return encode_default(o)
+
+    def _option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._option()).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._option(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the fastest available provider; call before Security(app), which wraps app.json_provider_class"""
+    app.json_provider_class = ORJSONProvider if orjson is not None else StdlibJSONProvider
+    app.json = app.json_provider_class(app)
@@ -1,7 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_security import UserMixin, RoleMixin
 from pytz import timezone
-from sqlalchemy import CheckConstraint
+from sqlalchemy import CheckConstraint, text
 from datetime import datetime
 from sqlalchemy.orm import validates
 from sqlalchemy import Enum as SAEnum
@@ -42,6 +42,9 @@ class User(db.Model, UserMixin):
     # __table_args__ = (
     #     CheckConstraint('length(mobile) = 10', name='check_mobile_length'),  # EXACT 10 characters 
     # )
+    __table_args__ = (
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),        # keyset pagination of the admin user list
+    )
 
     @validates('mobile')
     def validate_mobile(self, key, value):
@@ -65,7 +68,8 @@ class Role(db.Model, RoleMixin):
 
 role_user = db.Table('role_user',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('role_id', db.Integer, db.ForeignKey('role.id'))
+    db.Column('role_id', db.Integer, db.ForeignKey('role.id')),
+    db.Index('ix_role_user_user_role', 'user_id', 'role_id'),      # roles are loaded for every authenticated request
 )
 
 
@@ -100,7 +104,9 @@ class Professional(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     location_id = db.Column(db.Integer, db.ForeignKey('location.id'), nullable=False)
     
-    rating = db.Column(db.Float, nullable=True, default=5)
+    rating = db.Column(db.Float, nullable=True, default=5)     # mean of the reviews, rating_sum / rating_count
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Float, nullable=False, default=0)
     experience = db.Column(db.Float, nullable=True)
     available = db.Column(db.Boolean, default=True)
     # image_url = db.Column(db.String(120), nullable=True)
@@ -109,11 +115,20 @@ class Professional(db.Model):
     status = db.Column(db.String(20), default="pending")  # 'pending', 'verified', or 'rejected'
     status_updated_at = db.Column(db.DateTime, nullable= True)
     remarks = db.Column(db.String(150))
+    version_id = db.Column(db.Integer, nullable=False, default=1)     # optimistic lock, bumped on every update of the row
+    assign_version = db.Column(db.Integer, nullable=False, default=1)     # bumped by dispatch on every assignment, see dispatch.claim
     # Define relationships
     category = db.relationship('Category', backref='professionals', lazy='joined')
     location = db.relationship('Location', backref='professionals', lazy='joined')
     user = db.relationship('User', uselist=False, backref='professional')
 
+    __table_args__ = (
+        db.Index('ix_professional_location_category_available', 'location_id', 'category_id', 'available'),
+        db.Index('ix_professional_user', 'user_id'),
+        db.Index('ix_professional_created_at_id', 'created_at', 'id'),    # keyset pagination of the admin professional list
+    )
+    __mapper_args__ = {'version_id_col': version_id}
+
     def __repr__(self):
         return f"<Professional {self.id}>"
 
@@ -136,6 +151,10 @@ class UserAddress(db.Model):
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
     updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_user_address_user', 'user_id'),
+    )
     
 
 
@@ -157,6 +176,7 @@ class Service(db.Model):
     
     __table_args__ = (
         CheckConstraint('base_price >= 10 AND base_price <= 1000', name='check_price_positive'),
+        db.Index('ix_service_category_active', 'category_id', 'active'),
     )
     def __repr__(self):
         return '<Service %r>' % self.name
@@ -181,6 +201,10 @@ class ServiceLocation(db.Model):
     category = db.relationship('Category', backref=db.backref('service_location'))
     location = db.relationship('Location', backref=db.backref('service_location'))
 
+    __table_args__ = (
+        db.Index('ix_service_location_location_category_active', 'location_id', 'category_id', 'active'),
+    )
+
 
 class ServiceRequest(db.Model):
     __tablename__ = 'service_request'
@@ -197,12 +221,46 @@ class ServiceRequest(db.Model):
 
     total_price = db.Column(db.Float, nullable=False,default=0)
     remarks = db.Column(db.String(120), nullable=True)
+    dispatch_hops = db.Column(db.Integer, nullable=False, default=0)     # times the request was re-dispatched after a rejection
+    version_id = db.Column(db.Integer, nullable=False, default=1)        # optimistic lock, bumped on every update
 
     service = db.relationship('Service', backref='service_requests', lazy='joined')
     locaation = db.relationship('Location', backref='service_requests', lazy='joined')
     user = db.relationship('User', backref='service_requests', lazy='joined')
     professional = db.relationship('Professional', backref='service_requests', lazy='joined')
 
+    __table_args__ = (
+        db.Index('ix_service_request_user_service_status', 'user_id', 'service_id', 'status'),
+        db.Index('ix_service_request_status_location', 'status', 'location_id'),       # pending backlog sweep and waitlist loads
+        # a user can hold only one active request per service, enforced by the database rather than check-then-insert
+        db.Index('uq_service_request_active', 'user_id', 'service_id', unique=True,
+                 sqlite_where=text("status IN ('PENDING', 'ASSIGNED', 'ACCEPTED')"),
+                 postgresql_where=text("status IN ('PENDING', 'ASSIGNED', 'ACCEPTED')")),
+    )
+    __mapper_args__ = {'version_id_col': version_id}
+
+
+
+# one narrow row per service request with exactly what the user's bookings list shows (see application/bookings.py)
+class BookingView(db.Model):
+    __tablename__ = 'booking_view'
+    id = db.Column(db.Integer, db.ForeignKey('service_request.id'), primary_key=True)     # same id as the service request
+
+    user_id = db.Column(db.Integer, nullable=False)
+    service_id = db.Column(db.Integer, nullable=False)
+    service_name = db.Column(db.String(120), nullable=True)
+    total_price = db.Column(db.Float, nullable=False, default=0)
+    remarks = db.Column(db.String(120), nullable=True)
+    status = db.Column(db.Enum(StatusEnum), nullable=False)
+    professional_id = db.Column(db.Integer, nullable=True)
+    professional_name = db.Column(db.String(120), nullable=True)
+    request_date = db.Column(db.DateTime, nullable=False)
+    completition_date = db.Column(db.DateTime, nullable=True)
+    dispatch_hops = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_booking_view_user_request_date_id', 'user_id', 'request_date', 'id'),     # cursor pagination per user
+    )
 
 
 class AssignRequest(db.Model):
@@ -214,6 +272,11 @@ class AssignRequest(db.Model):
     accept_reject_date = db.Column(db.DateTime, nullable=True)
     completition_date = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_assign_request_service_request_professional', 'service_request_id', 'professional_id'),    # rejection history lookups on re-dispatch
+        db.Index('ix_assign_request_professional_status', 'professional_id', 'status'),
+    )
+
 
 class Payment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -238,6 +301,10 @@ class ServiceReview(db.Model):
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
     updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('uq_service_review_service_request', 'service_request_id', unique=True),    # one review per booking
+    )
     
 class ProfessionalReview(db.Model):
     __tablename__ = 'professional_review'
@@ -248,4 +315,11 @@ class ProfessionalReview(db.Model):
     review_text = db.Column(db.String(120), nullable=True)
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
-    updated_at = db.Column(db.DateTime, nullable=True)
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+# dashboard counters kept in step with the rows they count (see application/stats.py)
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counter'
+    metric = db.Column(db.String(40), primary_key=True)     # users, services, professionals_by_location, ...
+    ref_id = db.Column(db.Integer, primary_key=True, default=0)     # category / location id, 0 for totals
+    value = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+MAX_PER_PAGE = 100
+
+
+def encode_cursor(values):
+    """Opaque, url safe token for the sort key of the last row on a page"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Inverse of encode_cursor; raises ValueError for anything that was not issued by it"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("Invalid cursor")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        column_type = getattr(column, 'type', column)    # a column or a bare type
+        if value is not None and column_type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+def keyset_page_query(query, columns, cursor=None, per_page=20, descending=False):
+    """query narrowed to the page after the cursor: filtered on the sort key, ordered and limited
+
+    Fetches one row more than per_page, so the caller can tell whether another page follows.
+    Raises ValueError for a cursor that was not issued by encode_cursor.
+    """
+    if cursor:
+        last = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(tuple_(*columns) < last if descending else tuple_(*columns) > last)
+
+    order = [column.desc() for column in columns] if descending else columns
+    return query.order_by(*order).limit(per_page + 1)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, descending=False):
+    """Return one page of query ordered by columns, starting after the row the cursor points at
+
+    Unlike OFFSET pagination the database seeks straight to the cursor through an index on
+    the same columns, so every page costs the same as the first. descending walks the same
+    index backwards (newest first).
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+
+    items = keyset_page_query(query, columns, cursor, per_page, descending).all()
+    if len(items) <= per_page:
+        return items, None
+
+    items = items[:per_page]
+    return items, encode_cursor([getattr(items[-1], column.key) for column in columns])
@@ -0,0 +1,45 @@
+from application.model import db
+
+
+class Field:
+    """One response key: the column or SQL expression it is read from, and an optional conversion of the value"""
+
+    def __init__(self, column, convert=None):
+        self.column = column
+        self.convert = convert
+
+
+class Projection:
+    """A response shape declared as {key: column}, loaded as plain rows instead of ORM objects
+
+    query() selects exactly the declared columns, each labelled with its response key, from the
+    base entity and the declared joins. A list endpoint built on it never hydrates models, so
+    their lazy='joined' relationships are not loaded either. Extra columns passed to query()
+    (the sort keys keyset_paginate reads back from the last row) are left out by dump().
+    """
+
+    def __init__(self, base, fields, joins=(), outerjoins=()):
+        self.base = base
+        self.fields = {key: field if isinstance(field, Field) else Field(field) for key, field in fields.items()}
+        self.joins = joins              # [(target, onclause)], applied before the outer joins
+        self.outerjoins = outerjoins
+
+    def query(self, *extra_columns):
+        query = db.session.query(*[field.column.label(key) for key, field in self.fields.items()], *extra_columns)
+        query = query.select_from(self.base)
+        for target, onclause in self.joins:
+            query = query.join(target, onclause)
+        for target, onclause in self.outerjoins:
+            query = query.outerjoin(target, onclause)
+        return query
+
+    def dump(self, row):
+        return {key: field.convert(value) if field.convert else value
+                for (key, field), value in zip(self.fields.items(), row)}
+
+    def dump_all(self, rows):
+        return [self.dump(row) for row in rows]
+
+
+def enum_name(value):
+    return value.name if value is not None else None
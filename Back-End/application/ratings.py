@@ -0,0 +1,63 @@
+from sqlalchemy import case, func, or_, select, update
+from application.model import db, Professional, ServiceRequest, ServiceReview
+
+
+MIN_RATING, MAX_RATING = 1, 5
+
+
+def record_review(booking, rating, review_text=None):
+    """Store the review of a completed booking and fold it into the professional's running rating
+
+    The aggregate is updated with one UPDATE that adds to rating_count / rating_sum, so the cost
+    is the same for the first review and the thousandth, and concurrent reviews cannot lose a write.
+    The caller commits.
+    """
+    review = ServiceReview(service_request_id=booking.id, rating=rating, review_text=review_text)
+    db.session.add(review)
+    db.session.flush()      # raises IntegrityError if this booking was reviewed concurrently
+
+    # SET expressions read the old row values, so the mean uses the incremented count and sum
+    db.session.execute(
+        update(Professional)
+        .where(Professional.id == booking.professional_id)
+        .values(
+            rating_count=Professional.rating_count + 1,
+            rating_sum=Professional.rating_sum + rating,
+            rating=(Professional.rating_sum + rating) / (Professional.rating_count + 1),
+        )
+    )
+    return review
+
+
+def recompute_ratings():
+    """Rebuild every professional's rating aggregate from the reviews, correcting any drift
+
+    Professionals without reviews keep their current rating. Only rows whose aggregate actually
+    changes are written. Returns the user ids of those professionals, whose cached profiles are stale.
+    """
+    reviews = (
+        select(ServiceRequest.professional_id.label('professional_id'),
+               func.count(ServiceReview.id).label('count'),
+               func.sum(ServiceReview.rating).label('total'))
+        .join(ServiceRequest, ServiceRequest.id == ServiceReview.service_request_id)
+        .group_by(ServiceRequest.professional_id)
+        .subquery()
+    )
+    count = select(reviews.c.count).where(reviews.c.professional_id == Professional.id).scalar_subquery()
+    total = select(reviews.c.total).where(reviews.c.professional_id == Professional.id).scalar_subquery()
+
+    rating_count = func.coalesce(count, 0)
+    rating_sum = func.coalesce(total, 0)
+    rating = case((rating_count > 0, total / count), else_=Professional.rating)
+
+    user_ids = db.session.execute(
+        update(Professional)
+        .where(or_(Professional.rating_count != rating_count,
+                   Professional.rating_sum != rating_sum,
+                   Professional.rating.is_distinct_from(rating)))
+        .values(rating_count=rating_count, rating_sum=rating_sum, rating=rating)
+        .returning(Professional.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return user_ids
@@ -1,12 +1,21 @@
 from flask import Blueprint, jsonify, request, current_app as app
-from application.model import User,Role, db, Professional, Category, Location, Service
+from application.model import User,Role, db, Professional, Category, Location, Service, role_user
 from application.sec import datastore
 from datetime import datetime
 from pytz import timezone
-from sqlalchemy import and_, text
+from sqlalchemy import and_, select, text
 from sqlalchemy.orm import joinedload
-from sqlalchemy.sql import func
+from sqlalchemy.orm.exc import StaleDataError
 from flask_security import auth_required, roles_required
+from application.dispatch import dispatch_index, assign_waitlisted
+from application.pagination import keyset_paginate
+from application.search import search_enabled, search_professionals, count_search
+from application.stats import dashboard_counters
+from application.caching import invalidate, profile_tag, cached_view, memoized
+from application.catalog import catalog_cached
+from application.warmup import refresh_catalog, DASHBOARD_TIMEOUT
+from application.projection import Projection, Field
+from application.streaming import streamable
 
 
 cache = app.cache
@@ -17,51 +26,96 @@ IST = timezone('Asia/Kolkata')
 admin_bp = Blueprint('admin_bp', __name__)
 
 
+# response shapes of the list endpoints, loaded as plain rows (see application/projection.py)
+USER_ROWS = Projection(User, {
+    "id": User.id,
+    "name": User.name,
+    "email": User.email,
+    "mobile": User.mobile,
+    "active": User.active,
+    # users hold a single role; a correlated lookup instead of loading u.roles per row
+    "role": select(Role.name).join(role_user, role_user.c.role_id == Role.id)
+            .where(role_user.c.user_id == User.id).limit(1).correlate(User).scalar_subquery(),
+    "created_at": User.created_at,
+    "updated_at": User.updated_at,
+})
+
+PROFESSIONAL_ROWS = Projection(Professional, {
+    "id": Professional.id,
+    "name": User.name,
+    "email": User.email,
+    "mobile": User.mobile,
+    "experience": Professional.experience,
+    "active": User.active,
+    "status": Professional.status,
+    "category": Category.name,
+    "location": Location.city,
+}, joins=[(User, User.id == Professional.user_id)],
+   outerjoins=[(Category, Category.id == Professional.category_id), (Location, Location.id == Professional.location_id)])
+
+SERVICE_ROWS = Projection(Service, {
+    "id": Service.id,
+    "name": Service.name,
+    "description": Service.description,
+    "image_url": Field(Service.image_url, lambda url: url or "https://placehold.co/100x100"),
+    "category_name": Field(Category.name, lambda name: name or "N/A"),
+    "base_price": Service.base_price,
+    "created_at": Field(Service.created_at, lambda at: at.strftime('%Y-%m-%d %H:%M')),
+    "updated_at": Field(Service.updated_at, lambda at: at.strftime('%Y-%m-%d %H:%M') if at else "N/A"),
+    "active": Service.active,
+}, outerjoins=[(Category, Category.id == Service.category_id)])
+
+
 @admin_bp.route('/users', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
 # @cache.cached(timeout=60)
 def users():
-    # Get page number and items per page from request args (default: page 1, 10 items per page)
-    page = request.args.get('page', 1, type=int)
+    # Keyset pagination: the cursor from the previous page (none for the first page) and items per page
+    cursor = request.args.get('cursor', None, type=str)
     per_page = request.args.get('per_page', 10, type=int)
+    with_total = request.args.get('with_total', '', type=str) == 'true'
     role = request.args.get('role', '', type=str)
     status = request.args.get('status', '', type=str)
 
-    # Build the base query
-    query = User.query.filter(User.id != 1)  # Exclude admin with id=1
+    query = filtered_users(role, status, USER_ROWS.query())
+
+    # Seek to the page through the (created_at, id) index instead of OFFSET + COUNT(*)
+    try:
+        page, next_cursor = keyset_paginate(query, [User.created_at, User.id], cursor, per_page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    response = {
+        'users': USER_ROWS.dump_all(page),
+        'next_cursor': next_cursor
+    }
+    if with_total:
+        response['total'] = count_users(role, status)
+    return jsonify(response)
+
+
+def filtered_users(role, status, query=None):
+    # Build the base query (User.query, or a projection of it)
+    query = (query if query is not None else User.query).filter(User.id != 1)  # Exclude admin with id=1
 
     # Apply role filter if provided
     if role:
         # query = query.join(User.roles).filter(Role.name == role)
         query = query.join(User.roles).filter(Role.name.ilike(role))
 
-
     # Apply status filter if provided
     if status:
         is_active = True if status == 'true' else False
         query = query.filter(User.active == is_active)
 
-    # Paginate the query
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-
-    # Extract user data
-    users = [{
-        "id": u.id,
-        "name": u.name,
-        "email": u.email,
-        "mobile": u.mobile,
-        "active": u.active,
-        "role": u.roles[0].name if u.roles else None,
-        "created_at": u.created_at,
-        "updated_at": u.updated_at
-    } for u in pagination.items]
+    return query
 
-    return jsonify({
-        'users': users,
-        'total_pages': pagination.pages,
-        'current_page': pagination.page
-    })
+
+@memoized(timeout=300)
+def count_users(role, status):
+    """Approximate total for the user list, counted at most once per 5 minutes per filter"""
+    return filtered_users(role, status).order_by(None).count()
 
 
 
@@ -77,11 +131,16 @@ def toggle_user_activation(user_id):
             # Deactivate the user
             user.active = False
             db.session.commit()
+            for professional in user.professional:
+                dispatch_index.sync(professional)
             return jsonify({"message": "User deactivated successfully"}), 200
         else:
             # Activate the user
             user.active = True
             db.session.commit()
+            for professional in user.professional:
+                dispatch_index.sync(professional)
+                assign_waitlisted(professional)
             return jsonify({"message": "User activated successfully"}), 200
 
     return jsonify({"message": "User not found"}), 404
@@ -121,7 +180,7 @@ def user_details(id):
 @admin_bp.route('/get-categories', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
-@cache.cached(timeout=60)
+@catalog_cached
 def get_categories():
     # filter and fetch category data from database which is active
     categories = Category.query.filter_by(active=True).order_by(Category.name).all()
@@ -147,6 +206,7 @@ def add_location():
     location = Location(city=city, state=state)
     db.session.add(location)
     db.session.commit()
+    refresh_catalog()
 
     return jsonify({"message": "Location added successfully"}), 201
 
@@ -165,6 +225,7 @@ def add_category():
     category = Category(name=name, description=description, image_url=image_url)
     db.session.add(category)
     db.session.commit()
+    refresh_catalog()
 
     return jsonify({"message": "Category added successfully"}), 201
 
@@ -186,6 +247,7 @@ def update_category(id):
     category.image_url = image_url
 
     db.session.commit()
+    refresh_catalog()
     return jsonify({"message": "Category updated successfully"}), 200
 
 @admin_bp.route('/update-location/<int:id>', methods=['PUT'])
@@ -204,6 +266,7 @@ def update_location(id):
     location.state = state
 
     db.session.commit()
+    refresh_catalog()
     return jsonify({"message": "Location updated successfully"}), 200
 
 
@@ -211,7 +274,7 @@ def update_location(id):
 @admin_bp.route('/get-locations', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
-@cache.cached(timeout=60)
+@catalog_cached
 def get_locations():
     # filter and fetch location data from database which is active
     locations = Location.query.filter_by(active=True).order_by(Location.state).all()
@@ -220,17 +283,72 @@ def get_locations():
     return jsonify([{"id": l.id, "city": l.city, "state": l.state} for l in locations])
  
 
+def professionals_to_stream():
+    """Every professional matching the list filters, oldest first; search is a plain name/email match here"""
+    query = filtered_professionals(request.args.get('filter', 'all'), request.args.get('search', '').strip().lower(),
+                                   request.args.get('category', '').strip(), request.args.get('location', '').strip(),
+                                   PROFESSIONAL_ROWS.query())
+    return query.order_by(Professional.created_at, Professional.id)
+
+
 @admin_bp.route('/professionals', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
+@streamable(PROFESSIONAL_ROWS, professionals_to_stream)    # ?stream=ndjson|json: every match, unpaged
 def get_professionals():
     filter_status = request.args.get('filter', 'all')  # Get filter from query params
     search_query = request.args.get('search', '').strip().lower()  # Get search input
     category_filter = request.args.get('category', '').strip()
     location_filter = request.args.get('location', '').strip()
+    cursor = request.args.get('cursor', None, type=str)
+    per_page = request.args.get('per_page', 20, type=int)
+    with_total = request.args.get('with_total', '', type=str) == 'true'
+
+    try:
+        if search_query and search_enabled():
+            # Ranked full-text lookup with the status, category and location filters applied inside the index query
+            ids, next_cursor = search_professionals(search_query, filter_status, category_filter, location_filter,
+                                                    cursor, per_page)
+            by_id = {row.id: row for row in PROFESSIONAL_ROWS.query().filter(Professional.id.in_(ids))}
+            professionals = [by_id[i] for i in ids if i in by_id]
+        else:
+            query = filtered_professionals(filter_status, search_query, category_filter, location_filter,
+                                           PROFESSIONAL_ROWS.query(Professional.created_at))
+            professionals, next_cursor = keyset_paginate(query, [Professional.created_at, Professional.id], cursor, per_page)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
 
-    # Define base query with necessary joins
-    query = Professional.query.join(User)
+    results = PROFESSIONAL_ROWS.dump_all(professionals)
+
+        # user_id': user_id,
+
+        # 'name': professional.user.name,
+        # 'email': professional.user.email,
+        # 'mobile': professional.user.mobile,
+        # 'experience': professional.experience,
+        # 'category': professional.category.name if professional.category else 'N/A',
+        # 'location': professional.location.city if professional.location else 'N/A',
+
+        # 'profile_img_url': professional.user.profile_img_url,
+        # 'rating': professional.rating,
+        # 'available': professional.available,
+        # 'verified': professional.status,
+        # 'created_at': professional.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        # 'up
+
+    response = {
+        "professionals": results,
+        "next_cursor": next_cursor
+    }
+    if with_total:
+        response["total"] = count_professionals(filter_status, search_query, category_filter, location_filter)
+    return jsonify(response)
+
+
+def filtered_professionals(filter_status, search_query, category_filter, location_filter, query=None):
+    # Define base query with necessary joins (PROFESSIONAL_ROWS.query() already joins User)
+    if query is None:
+        query = Professional.query.join(User)
 
     # Apply status filter
     if filter_status in ['pending', 'verified', 'rejected']:
@@ -240,7 +358,7 @@ def get_professionals():
             query = query.filter(Professional.status == filter_status)
 
 
-    # Apply search query (by name or email)
+    # Apply search query (by name or email) where the full-text index is not available
     if search_query:
         query = query.filter(
             (User.name.ilike(f"%{search_query}%")) | (User.email.ilike(f"%{search_query}%"))
@@ -254,37 +372,15 @@ def get_professionals():
     if location_filter:
         query = query.filter(Professional.location_id == location_filter)
 
-    professionals = query.all()
+    return query
 
-    results = [{
-        "id": p.id,
-        "name": p.user.name,  # Access User's name via relationship
-        "email": p.user.email,  # Access User's email
-        "mobile": p.user.mobile,  # Access User's mobile
-        "experience": p.experience,
-        "active": p.user.active,
-        "status": p.status,
-        "category": p.category.name,  # Fetch category name via relationship
-        "location": p.location.city  # Fetch location via relationship
-    } for p in professionals]
 
-        # user_id': user_id,
-
-        # 'name': professional.user.name,
-        # 'email': professional.user.email,
-        # 'mobile': professional.user.mobile,
-        # 'experience': professional.experience,
-        # 'category': professional.category.name if professional.category else 'N/A',
-        # 'location': professional.location.city if professional.location else 'N/A',
-
-        # 'profile_img_url': professional.user.profile_img_url,
-        # 'rating': professional.rating,
-        # 'available': professional.available,
-        # 'verified': professional.status,
-        # 'created_at': professional.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        # 'up
-
-    return jsonify(results)
+@memoized(timeout=300)
+def count_professionals(filter_status, search_query, category_filter, location_filter):
+    """Approximate total for the professional list, counted at most once per 5 minutes per filter"""
+    if search_query and search_enabled():
+        return count_search(search_query, filter_status, category_filter, location_filter)
+    return filtered_professionals(filter_status, search_query, category_filter, location_filter).order_by(None).count()
 
 
 
@@ -316,39 +412,35 @@ def update_professional_status(professional_id):
 
     try:
         db.session.commit()
+        dispatch_index.sync(professional)
+        invalidate(profile_tag(professional.user_id))
+        if professional.status == "verified":
+            assign_waitlisted(professional)
         return jsonify({
             "message": f"Professional {data.get('status')} successfully",
             "updated_at": professional.status_updated_at
         }), 200
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"message": "This professional was updated meanwhile. Please refresh and try again."}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Something went wrong", "error": str(e)}), 500
 
 
 
+def services_to_stream():
+    return SERVICE_ROWS.query().order_by(Service.name)
+
+
 @admin_bp.route('/get-services', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
-@cache.cached(timeout=60)
+@streamable(SERVICE_ROWS, services_to_stream)
+@catalog_cached
 def get_services():
-    services = Service.query.order_by(Service.name).all()
-    
-    result = [
-        {
-            "id": s.id,
-            "name": s.name,
-            "description": s.description,
-            "image_url": s.image_url or "https://placehold.co/100x100",
-            "category_name": s.category.name if s.category else "N/A",
-            "base_price": s.base_price,
-            "created_at": s.created_at.strftime('%Y-%m-%d %H:%M'),
-            "updated_at": s.updated_at.strftime('%Y-%m-%d %H:%M') if s.updated_at else "N/A",
-            "active": s.active
-        }
-        for s in services
-    ]
-    
-    return jsonify(result)
+    services = SERVICE_ROWS.query().order_by(Service.name).all()
+    return jsonify(SERVICE_ROWS.dump_all(services))
 
 
 @admin_bp.route('/add-service', methods=['POST'])
@@ -368,6 +460,7 @@ def add_service():
     service = Service(name=name, description=description, image_url=image_url, base_price=base_price, category_id=category_id)
     db.session.add(service)
     db.session.commit()
+    refresh_catalog()
 
     return jsonify({"message": "Service added successfully"}), 201
 
@@ -382,6 +475,7 @@ def delete_service(id):
 
     db.session.delete(service)
     db.session.commit()
+    refresh_catalog()
 
     return jsonify({"message": "Service deleted successfully"}), 200
 
@@ -404,6 +498,7 @@ def update_service(id):
     service.base_price = base_price
 
     db.session.commit()
+    refresh_catalog()
 
     return jsonify({"message": "Service updated successfully"}), 200
 
@@ -411,37 +506,31 @@ def update_service(id):
 @admin_bp.route('/dashboard', methods=['GET'])
 @auth_required('token')
 @roles_required('admin')
-@cache.cached(timeout=60)
+@cached_view(timeout=DASHBOARD_TIMEOUT)
 def admin_dashboard():
     stats = {
-        "total_services": Service.query.count(),
-        "total_users": User.query.count(),
-        "total_professionals": Professional.query.count(),
-        "total_categories": Category.query.count(),
-        "total_locations": Location.query.count()
+        "total_services": 0,
+        "total_users": 0,
+        "total_professionals": 0,
+        "total_categories": 0,
+        "total_locations": 0
     }
-
-    users_by_location = (
-            db.session.query(Location.city, func.count(Professional.id))
-            .join(Professional, Professional.location_id == Location.id)  # Join using foreign key
-            .group_by(Location.city)
-            .all()
-        )   
-    users_by_location = [{"name": city, "count": count} for city, count in users_by_location]
-
-    users_by_category = (
-            db.session.query(Category.name, func.count(Professional.id))
-            .join(Professional, Professional.category_id == Category.id)  # Join using foreign key
-            .group_by(Category.name)
-            .all()
-        )   
-    users_by_category = [{"name": name, "count": count} for name, count in users_by_category]
-
-
-    services_by_category = [
-        {"name": cat.name, "count": Service.query.filter_by(category_id=cat.id).count()}
-        for cat in Category.query.all()
-    ]
+    users_by_location, users_by_category, services_by_category = {}, {}, {}
+
+    # counters are maintained by application.stats on every write, so this is one small read
+    for metric, ref_id, value, category, city in dashboard_counters():
+        if ref_id == 0:
+            stats["total_" + metric] = value
+        elif metric == 'professionals_by_location' and city and value:
+            users_by_location[city] = users_by_location.get(city, 0) + value
+        elif metric == 'professionals_by_category' and category and value:
+            users_by_category[category] = users_by_category.get(category, 0) + value
+        elif metric == 'services_by_category' and category:
+            services_by_category[category] = services_by_category.get(category, 0) + value
+
+    users_by_location = [{"name": city, "count": count} for city, count in users_by_location.items()]
+    users_by_category = [{"name": name, "count": count} for name, count in users_by_category.items()]
+    services_by_category = [{"name": name, "count": count} for name, count in services_by_category.items()]
 
     return jsonify({
         "stats": stats,
@@ -1,6 +1,6 @@
 from flask import Blueprint, jsonify, request, current_app as app
-from application.model import Location, ServiceLocation, Service
-from sqlalchemy import and_
+from application.model import Location, Service
+from application.catalog import catalog_cached, serviceability, catalog_cache, catalog_bundle
 
 common_bp = Blueprint('common_bp', __name__)
 
@@ -10,7 +10,7 @@ cache = app.cache
 
 
 @common_bp.route('/get-locations', methods=['GET'])
-@cache.cached(timeout=30)
+@catalog_cached
 def get_location():
     state = request.args.get('state', None)
 
@@ -28,28 +28,20 @@ def get_location():
 
 @common_bp.route('/service-location/<int:location_id>', methods=['GET'])
 # @cache.cached(timeout=30)
-@cache.memoize(timeout=30)
+@catalog_cached
 def service_location(location_id):
-    # filter and fetch category data from database which is active
-    service_locations = ServiceLocation.query.filter(
-            and_(ServiceLocation.active == True, ServiceLocation.location_id == location_id)
-        ).all()
-
-    # if service locations are not found return empty list
-    if not service_locations:
-        return jsonify([])
-    
+    # active categories at this location, read from the in-memory serviceability bitmap
     return jsonify([
         {
-            "id": sl.category.id if sl.category else None,
-            "name": sl.category.name if sl.category else None,
+            "id": category_id,
+            "name": name,
         }
-        for sl in service_locations
+        for category_id, name in serviceability.categories(location_id)
     ])
 
 
 @common_bp.route('/services/<int:category_id>', methods=['GET'])
-@cache.memoize(timeout=30)
+@catalog_cached
 def get_services_by_category(category_id):
     services = Service.query.filter_by(category_id=category_id, active=True).all()
     return jsonify([
@@ -62,3 +54,25 @@ def get_services_by_category(category_id):
         }
         for service in services
     ])
+
+
+@common_bp.route('/catalog', methods=['GET'])
+def get_catalog():
+    """Locations, categories, services and serviceability in one precompressed, versioned response"""
+    version = catalog_cache.version()
+
+    # the client already holds this version: ?version= from its stored copy, or the ETag
+    if request.args.get('version') == version or request.if_none_match.contains(version):
+        response = app.response_class(status=304)
+    else:
+        raw, compressed = catalog_bundle()
+        if request.accept_encodings['gzip']:
+            response = app.response_class(compressed, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = app.response_class(raw, mimetype='application/json')
+
+    response.set_etag(version)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
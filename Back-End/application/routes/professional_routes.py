@@ -1,14 +1,56 @@
 from flask import Blueprint, request, jsonify, current_app as app
 from application.model import db, Professional, Category, Location, AssignRequest, ServiceRequest, IST, StatusEnum
+from application.model import Service, User, UserAddress
 from application.sec import datastore
-from werkzeug.security import generate_password_hash
+from application.hashing import HashingBusy, hash_password
 from flask_security import auth_required, roles_required, current_user
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql import func
+from sqlalchemy.orm.exc import StaleDataError
 from flask_security import auth_required, roles_required
+from application.dispatch import dispatch_index, assign_waitlisted, redispatch, waitlist
+from application.caching import cached_per_user, invalidate, bookings_tag, profile_tag, requests_tag
+from application.catalog import catalog_cached, CATALOG_TAG
+from application.projection import Projection, Field, enum_name
 
 professional_bp = Blueprint('professional_bp', __name__)
 
+FirstAddress = aliased(UserAddress)
+
+_first_address_id = (
+    select(func.min(FirstAddress.id))
+    .where(FirstAddress.user_id == ServiceRequest.user_id)
+    .correlate(ServiceRequest)
+    .scalar_subquery()
+)
+
+# one row of get_request (see application/projection.py)
+ASSIGNED_REQUEST_ROWS = Projection(AssignRequest, {
+    "id": AssignRequest.id,
+    "service_request_id": AssignRequest.service_request_id,
+    "service_name": Service.name,
+    "Service_description": Service.description,
+    "customer_address": UserAddress.address,
+    "customer_city": Location.city,
+    "customer_state": Location.state,
+    "customer_pincode": UserAddress.pincode,
+    "customer_mobile": User.mobile,
+    "status": Field(AssignRequest.status, enum_name),  # Ensure enum is converted to string
+    "assign_date": AssignRequest.assign_date,
+    "accept_reject_date": AssignRequest.accept_reject_date,
+    "completition_date": AssignRequest.completition_date,
+}, joins=[
+    (ServiceRequest, ServiceRequest.id == AssignRequest.service_request_id),
+    (Service, Service.id == ServiceRequest.service_id),
+    (User, User.id == ServiceRequest.user_id),
+], outerjoins=[
+    (UserAddress, UserAddress.id == _first_address_id),
+    (Location, Location.id == UserAddress.location_id),
+])
+
 cache = app.cache
 
 @professional_bp.route('/register-professional', methods=['POST'])
@@ -33,7 +75,7 @@ def register_professional():
 
     try:
         # Create user
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         new_user = datastore.create_user(
             name=name,
             email=email,
@@ -63,6 +105,8 @@ def register_professional():
         # mail.send(msg)
 
         return jsonify({"message": "Registration successful! Verify your email with OTP."}), 201
+    except HashingBusy:
+        raise   # answered with a 503 by the app's handler
     except Exception as e:
         db.session.rollback()  # Rollback on error
         return jsonify({"message": "Registration failed", "error": str(e)}), 500
@@ -70,7 +114,7 @@ def register_professional():
 
 
 @professional_bp.route('/get-categories', methods=['GET'])
-@cache.cached(timeout=30)
+@catalog_cached
 def get_categories():
     # filter and fetch category data from database which is active
     categories = Category.query.filter_by(active=True).all()
@@ -80,7 +124,7 @@ def get_categories():
 
 
 @professional_bp.route('/get-locations', methods=['GET'])
-@cache.cached(timeout=30)
+@catalog_cached
 def get_locations():
     # filter and fetch location data from database which is active
     locations = Location.query.filter_by(active=True).all()
@@ -92,32 +136,15 @@ def get_locations():
 @professional_bp.route('/get-requests', methods=['GET'])
 @auth_required('token')
 @roles_required('professional')
-@cache.memoize(timeout=30)
+@cached_per_user(requests_tag, shared_tags=[CATALOG_TAG])
 def get_request():
     try:
         # Get professional ID from current user
         professional_id = current_user.professional[0].id
 
-        # Fetch requests with related data (efficient querying)
-        requests = AssignRequest.query.filter_by(professional_id=professional_id).all()
-        # service_name = ServiceRequest.query.get(r.service_request_id)
-
-        # Prepare response data
-        data = [{
-           "id":r.id,
-            "service_request_id":r.service_request_id,
-            "service_name": ServiceRequest.query.get(r.service_request_id).service.name,
-            "Service_description": ServiceRequest.query.get(r.service_request_id).service.description,
-            "customer_address": ServiceRequest.query.get(r.service_request_id).user.user_address[0].address,
-            "customer_city": ServiceRequest.query.get(r.service_request_id).user.user_address[0].location.city,
-            "customer_state": ServiceRequest.query.get(r.service_request_id).user.user_address[0].location.state,
-            "customer_pincode": ServiceRequest.query.get(r.service_request_id).user.user_address[0].pincode,
-            "customer_mobile": ServiceRequest.query.get(r.service_request_id).user.mobile,
-            "status": r.status.name,  # Ensure enum is converted to string
-            "assign_date": r.assign_date.isoformat() if r.assign_date else None,
-            "accept_reject_date": r.accept_reject_date.isoformat() if r.accept_reject_date else None,
-            "completition_date": r.completition_date.isoformat() if r.completition_date else None
-        } for r in requests]
+        # One query for every assignment with its service and customer details
+        requests = assigned_requests_query(professional_id).all()
+        data = ASSIGNED_REQUEST_ROWS.dump_all(requests)
 
         return jsonify(data), 200
 
@@ -125,6 +152,11 @@ def get_request():
         return jsonify({"error": "Something went wrong", "details": str(e)}), 500
     
 
+def assigned_requests_query(professional_id):
+    """Column-only query for a professional's assignments, joined to service, customer and the customer's first address"""
+    return ASSIGNED_REQUEST_ROWS.query().filter(AssignRequest.professional_id == professional_id)
+
+
 @professional_bp.route('/update-request-status/<int:request_id>', methods=['POST'])
 @auth_required('token')
 @roles_required('professional')
@@ -150,6 +182,10 @@ def update_request_status(request_id):
         if request_obj.status.name == "COMPLETED":
             return jsonify({"error": "Completed requests cannot be modified"}), 400
 
+        # A rejected request may already be with another professional
+        if request_obj.status.name == "REJECTED":
+            return jsonify({"error": "Rejected requests cannot be modified"}), 400
+
         # Check if the logged-in professional owns this request
         professional_id = current_user.professional[0].id
         if request_obj.professional_id != professional_id:
@@ -166,8 +202,11 @@ def update_request_status(request_id):
         
         elif status == "REJECTED":
             request_obj.status = StatusEnum.REJECTED
-            service_request.status = StatusEnum.REJECTED
             request_obj.accept_reject_date = now
+            db.session.flush()
+
+            # offer it to the next best professional instead of sending the customer back to book again
+            next_professional = redispatch(service_request)
         
         elif status == "COMPLETED":
             if request_obj.status != StatusEnum.ACCEPTED:
@@ -178,7 +217,34 @@ def update_request_status(request_id):
             service_request.completition_date = now
             request_obj.completition_date = now
 
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"error": "This request was updated meanwhile. Please refresh and try again."}), 409
+
+        # the customer's bookings list and every professional who now holds or held the job
+        tags = [bookings_tag(service_request.user_id), requests_tag(current_user.id)]
+        if status == "REJECTED" and next_professional:
+            tags.append(requests_tag(next_professional.user_id))
+        invalidate(*tags)
+
+        # a rejected or completed job no longer counts against the professional's load
+        if status in ["REJECTED", "COMPLETED"]:
+            dispatch_index.released(professional_id)
+
+        if status == "REJECTED":
+            if next_professional:
+                dispatch_index.assigned(next_professional.id)
+            elif service_request.status == StatusEnum.PENDING:
+                waitlist.push(service_request.location_id, service_request.service.category_id, service_request.id)
+
+            return jsonify({
+                "message": "Request rejected successfully",
+                "service_request_status": service_request.status.name,
+                "hops": service_request.dispatch_hops
+            }), 200
+
         return jsonify({"message": f"Request {status.lower()} successfully"}), 200
 
     except Exception as e:
@@ -190,7 +256,7 @@ def update_request_status(request_id):
 @professional_bp.route('/profile', methods=['GET'])
 @auth_required('token')
 @roles_required('professional')
-@cache.memoize(timeout=30)
+@cached_per_user(profile_tag, shared_tags=[CATALOG_TAG])
 def get_professional_profile():
     """Fetch professional profile details"""
     user_id = int(current_user.id)  # Get user ID from JWT token
@@ -211,6 +277,7 @@ def get_professional_profile():
         "city": professional.location.city if professional.location else None,
         "state": professional.location.state if professional.location else None,
         "rating": professional.rating,
+        "rating_count": professional.rating_count,
         "experience": professional.experience,
         "available": professional.available,
         "status": professional.status,
@@ -237,13 +304,24 @@ def update_availability():
 
         # Toggle availability
         professional.available = not professional.available
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"error": "Your profile was updated meanwhile. Please refresh and try again."}), 409
+        dispatch_index.sync(professional)
+        invalidate(profile_tag(user_id))
+
+        # hand over the oldest request waiting for this location and category
+        if professional.available:
+            assign_waitlisted(professional)
 
         return jsonify({"message": "Availability status updated", "available": professional.available}), 200
 
     except ValueError:
         return jsonify({'error': 'Invalid user ID'}), 400
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
 
 
@@ -306,8 +384,14 @@ def update_profile():
 
         # Commit updates
         db.session.commit()
+        dispatch_index.sync(professional)
+        invalidate(profile_tag(user_id))
         return jsonify({"message": "Profile updated successfully"}), 200
 
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Your profile was updated meanwhile. Please refresh and try again."}), 409
+
     except SQLAlchemyError as e:
         db.session.rollback()  # Rollback in case of error
         return jsonify({'error': 'Database error occurred', 'details': str(e)}), 500
@@ -1,15 +1,36 @@
 from flask import Blueprint, request, jsonify,current_app as app
-from werkzeug.security import generate_password_hash
 from flask_security import auth_required, current_user, roles_required
-from application.model import db, User, ServiceRequest, StatusEnum, Professional, Service, UserAddress, ServiceLocation, AssignRequest
+from application.model import db, User, ServiceRequest, StatusEnum, Professional, Service, UserAddress
+from application.model import BookingView
 from application.sec import datastore
+from application.hashing import HashingBusy, hash_password
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import desc, and_
 from werkzeug.exceptions import BadRequest
 from celery_tasks.tasks import send_welcome_email
+from application.dispatch import create_booking, dispatch_index
+from application.ratings import record_review, MIN_RATING, MAX_RATING
+from application.pagination import keyset_paginate
+from application.projection import Projection, Field, enum_name
+from application.caching import cached_per_user, invalidate, address_tag, bookings_tag, profile_tag, requests_tag
+from application.catalog import serviceability, CATALOG_TAG
+from sqlalchemy.orm.exc import StaleDataError
 
 user_bp = Blueprint('user_bp', __name__)
 
+# a page of get_bookings, straight from booking_view's columns (see application/projection.py)
+BOOKING_ROWS = Projection(BookingView, {
+    "id": BookingView.id,
+    "service_id": BookingView.service_id,
+    "service_name": BookingView.service_name,
+    "total_price": BookingView.total_price,
+    "remarks": BookingView.remarks,
+    "status": Field(BookingView.status, enum_name),  # Convert Enum to string
+    "professional": Field(BookingView.professional_name, lambda name: name or ""),
+    "completition_date": BookingView.completition_date,
+    "requested_at": BookingView.request_date,
+    "hops": BookingView.dispatch_hops,
+})
+
 cache = app.cache
 
 @user_bp.route('/register_user', methods=['POST'])
@@ -36,7 +57,7 @@ def register_user():
         user = datastore.create_user(
             name=name,
             email=email,
-            password=generate_password_hash(password),  # Hash password before saving
+            password=hash_password(password),  # Hash password before saving
             mobile=mobile,
             roles=['user'],
             active=True    
@@ -46,6 +67,8 @@ def register_user():
         send_welcome_email.delay(user.email,user.name)
         return jsonify({"message": "User registered successfully"}), 201
 
+    except HashingBusy:
+        raise   # answered with a 503 by the app's handler
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -53,7 +76,7 @@ def register_user():
 @user_bp.route('/user_address', methods=['GET'])  
 @auth_required('token')
 @roles_required('user')
-@cache.memoize(timeout=30)
+@cached_per_user(address_tag, shared_tags=[CATALOG_TAG])
 def get_user_address():
     user = current_user
     user_address = user.user_address[0] if user.user_address else None
@@ -94,6 +117,7 @@ def add_address():
 
         db.session.add(new_address)  # Add to session
         db.session.commit()  # Commit changes
+        invalidate(address_tag(user.id))
 
         return jsonify({"message": "Address added successfully"}), 201
 
@@ -128,6 +152,7 @@ def update_address():
         user_address.pincode = pincode
 
         db.session.commit()  # Commit changes
+        invalidate(address_tag(user.id))
 
         return jsonify({"message": "Address updated successfully"}), 200
 
@@ -173,12 +198,7 @@ def book_service(service_id):
         user_location_id = user_location.location_id
         selected_service_category_id = service.category_id
 
-        service_location = ServiceLocation.query.filter(
-            and_(ServiceLocation.location_id == user_location_id, 
-                 ServiceLocation.category_id == selected_service_category_id)
-        ).first()
-
-        if not service_location:
+        if not serviceability.is_served(user_location_id, selected_service_category_id):
             return jsonify({
                 "message": "This Category services are not available at your location. Please update your city.",
                 "status": "error"
@@ -208,32 +228,9 @@ def book_service(service_id):
                 "status": "error"
             }), 409
 
-        # Find an available professional
-        professional = Professional.query.filter(
-            Professional.user.has(active=True),
-            Professional.available == True,
-            # Professional.category_id == category_id,  
-            Professional.location_id == user_location_id
-        ).first()
-
-        # Create and save the booking request
-        booking = ServiceRequest(
-            user_id=user_id,
-            service_id=service_id,
-            location_id=user_location_id,
-            professional_id=professional.id if professional else None,
-            total_price=price,
-            remarks=remarks,
-            status=StatusEnum.ASSIGNED if professional else StatusEnum.PENDING
-        )
-        db.session.add(booking)
-        db.session.flush()
-
-        if professional:
-            assign = AssignRequest(service_request_id=booking.id, professional_id=professional.id, status = StatusEnum.ASSIGNED)
-            db.session.add(assign)
-
-        db.session.commit()
+        # Insert the booking and claim the best ranked available professional atomically
+        booking, professional = create_booking(user_id, service, user_location_id, price, remarks)
+        invalidate(bookings_tag(user_id), *([requests_tag(professional.user_id)] if professional else []))
 
         return jsonify({
             "message": "Booking successful.",
@@ -252,6 +249,12 @@ def book_service(service_id):
 
     except IntegrityError as e:
         db.session.rollback()
+        # a concurrent booking for the same service won the unique active-request index
+        if "UNIQUE" in str(e.orig).upper():
+            return jsonify({
+                "message": "You already have an active request for this service.",
+                "status": "error"
+            }), 409
         return jsonify({
             "message": "Database integrity error. Please try again.",
             "status": "error",
@@ -277,26 +280,25 @@ def book_service(service_id):
 @user_bp.route('/get_bookings', methods=['GET'])
 @auth_required('token')
 @roles_required('user')
-@cache.memoize(timeout=30)
+@cached_per_user(bookings_tag, shared_tags=[CATALOG_TAG])
 def get_bookings():
     user_id = current_user.id
-    bookings = ServiceRequest.query.filter(ServiceRequest.user_id == user_id).order_by(desc(ServiceRequest.request_date)).all()
-    # return bookings # This is for testing purposes only
-    response = []
-    for booking in bookings:
-        response.append({
-            "id": booking.id,
-            "service_id": booking.service_id,
-            "service_name": booking.service.name,
-            "total_price": booking.total_price,
-            "remarks": booking.remarks,
-            "status": booking.status.name,  # Convert Enum to string
-            "professional": booking.professional.user.name if booking.professional else "",
-            "completition_date": booking.completition_date.isoformat() if booking.completition_date else None,
-            "requested_at": booking.request_date
-        })
+    # Keyset pagination, newest first: the cursor from the previous page (none for the first page) and items per page
+    cursor = request.args.get('cursor', None, type=str)
+    per_page = request.args.get('per_page', 20, type=int)
+
+    # booking_view holds one ready-made row per booking, so no joins or lazy loads per row
+    query = BOOKING_ROWS.query(BookingView.request_date).filter(BookingView.user_id == user_id)
+    try:
+        bookings, next_cursor = keyset_paginate(query, [BookingView.request_date, BookingView.id], cursor, per_page,
+                                                descending=True)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    response = BOOKING_ROWS.dump_all(bookings)
     return jsonify({"message":"Successfully fetched",
-                    "data":response}), 200
+                    "data":response,
+                    "next_cursor": next_cursor}), 200
 
 
 
@@ -322,9 +324,14 @@ def cancel_booking(booking_id):
         if not booking.service:
             return jsonify({"error": "Service details not found"}), 500
 
-        # Cancel the booking
+        # Cancel the booking; the version check fails if it was assigned meanwhile
         booking.status = StatusEnum.CANCELLED
-        db.session.commit()
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            return jsonify({"error": "This booking was updated meanwhile. Please refresh and try again."}), 409
+        invalidate(bookings_tag(user_id))
 
         return jsonify({
             "message": "Booking canceled successfully",
@@ -344,10 +351,59 @@ def cancel_booking(booking_id):
 
 
 
+# endpoint to review a completed booking
+@user_bp.route('/review/<int:booking_id>', methods=['POST'])
+@auth_required('token')
+@roles_required('user')
+def review_booking(booking_id):
+    try:
+        data = request.get_json() or {}
+        rating = data.get("rating")
+        review_text = data.get("review_text")
+
+        if isinstance(rating, bool) or not isinstance(rating, (int, float)) or not MIN_RATING <= rating <= MAX_RATING:
+            return jsonify({"error": f"Rating must be a number from {MIN_RATING} to {MAX_RATING}"}), 400
+
+        booking = ServiceRequest.query.filter(ServiceRequest.user_id == current_user.id,
+                                              ServiceRequest.id == booking_id).first()
+        if not booking:
+            return jsonify({"error": "Booking not found"}), 404
+
+        if booking.status != StatusEnum.COMPLETED or not booking.professional_id:
+            return jsonify({"error": "Only completed bookings can be reviewed."}), 400
+
+        record_review(booking, rating, review_text)
+        db.session.commit()
+
+        # matching ranks on the new rating straight away
+        professional = Professional.query.get(booking.professional_id)
+        dispatch_index.sync(professional)
+        invalidate(profile_tag(professional.user_id))
+
+        return jsonify({
+            "message": "Review submitted successfully",
+            "data": {
+                "booking_id": booking.id,
+                "rating": rating,
+                "professional_rating": professional.rating,
+                "professional_rating_count": professional.rating_count
+            }
+        }), 201
+
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "This booking has already been reviewed."}), 409
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while submitting the review.", "details": str(e)}), 500
+
+
+
 @user_bp.route('/profile', methods=['GET'])
 @auth_required('token')
 @roles_required('user')
-@cache.memoize(timeout=30)
+@cached_per_user(profile_tag)
 def get_profile():
     """Fetch user profile details"""
     user_id = int(current_user.id)  # Get user ID from JWT token
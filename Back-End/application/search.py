@@ -0,0 +1,168 @@
+import re
+from contextlib import contextmanager
+from sqlalchemy import DDL, event, text
+from application.model import db
+from application.pagination import encode_cursor, decode_cursor
+
+
+# FTS5 table over the searchable text of every professional; rowid is the professional id.
+# The UNINDEXED columns carry the admin list filters so they are applied inside the index query.
+CREATE_INDEX_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS professional_search USING fts5(
+    name, email, mobile, category, city,
+    status UNINDEXED, active UNINDEXED, category_id UNINDEXED, location_id UNINDEXED,
+    prefix='2 3'
+)
+"""
+
+# (re)index the professionals selected by {where}
+_DELETE = "DELETE FROM professional_search WHERE rowid IN (SELECT p.id FROM professional p WHERE {where})"
+_INSERT = """
+    INSERT INTO professional_search(rowid, name, email, mobile, category, city, status, active, category_id, location_id)
+    SELECT p.id, u.name, u.email, u.mobile, c.name, l.city, p.status, u.active, p.category_id, p.location_id
+    FROM professional p
+    LEFT JOIN "user" u ON u.id = p.user_id
+    LEFT JOIN category c ON c.id = p.category_id
+    LEFT JOIN location l ON l.id = p.location_id
+    WHERE {where}
+"""
+_REFRESH = " " + _DELETE + "; " + _INSERT + "; "
+
+# triggers keep the index in step with every writer, including create_db.py and bulk statements
+CREATE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS professional_search_ai AFTER INSERT ON professional BEGIN"
+    + _REFRESH.format(where="p.id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_au AFTER UPDATE OF user_id, category_id, location_id, status ON professional BEGIN"
+    + _REFRESH.format(where="p.id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_ad AFTER DELETE ON professional BEGIN"
+    " DELETE FROM professional_search WHERE rowid = OLD.id; END",
+    'CREATE TRIGGER IF NOT EXISTS professional_search_user_au AFTER UPDATE OF name, email, mobile, active ON "user" BEGIN'
+    + _REFRESH.format(where="p.user_id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_category_ai AFTER INSERT ON category BEGIN"
+    + _REFRESH.format(where="p.category_id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_category_au AFTER UPDATE OF name ON category BEGIN"
+    + _REFRESH.format(where="p.category_id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_location_ai AFTER INSERT ON location BEGIN"
+    + _REFRESH.format(where="p.location_id = NEW.id") + "END",
+    "CREATE TRIGGER IF NOT EXISTS professional_search_location_au AFTER UPDATE OF city ON location BEGIN"
+    + _REFRESH.format(where="p.location_id = NEW.id") + "END",
+]
+
+DROP_INDEX_TABLE = "DROP TABLE IF EXISTS professional_search"
+
+TRIGGER_NAMES = [
+    'professional_search_ai', 'professional_search_au', 'professional_search_ad', 'professional_search_user_au',
+    'professional_search_category_ai', 'professional_search_category_au',
+    'professional_search_location_ai', 'professional_search_location_au',
+]
+
+
+def is_search_table(name):
+    """The FTS5 table and the shadow tables SQLite keeps for it; not part of the models, so autogenerate skips them"""
+    return name == 'professional_search' or name.startswith('professional_search_')
+
+
+# db.create_all() / drop_all() manage the index alongside the tables (SQLite only)
+event.listen(db.metadata, 'after_create', DDL(CREATE_INDEX_TABLE).execute_if(dialect='sqlite'))
+for statement in CREATE_TRIGGERS:
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(db.metadata, 'before_drop', DDL(DROP_INDEX_TABLE).execute_if(dialect='sqlite'))
+
+
+@contextmanager
+def search_triggers_suspended(connection):
+    """Drop the index triggers around a batch recreate of professional (or user, category, location)
+
+    SQLite checks every trigger that names a table when that table is renamed, so while the
+    triggers exist alembic's "copy to a temp table, drop, rename back" fails on professional.
+    Row ids survive the copy, so the index itself stays valid; the triggers come back as they were.
+    """
+    if connection.dialect.name != 'sqlite':
+        yield
+        return
+
+    for trigger in TRIGGER_NAMES:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    yield
+    for statement in CREATE_TRIGGERS:
+        connection.execute(text(statement))
+
+
+def search_enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def rebuild_search_index(connection):
+    """Repopulate the whole index, used after installing it on an existing database"""
+    connection.execute(text("DELETE FROM professional_search"))
+    connection.execute(text(_INSERT.format(where="1 = 1")))
+
+
+def match_expression(search_query):
+    """Turn free text into an FTS5 query: every word must match as a prefix, in any indexed column"""
+    words = re.findall(r'\w+', search_query)
+    return ' '.join('"%s"*' % word.replace('"', '""') for word in words)
+
+
+def _filters(filter_status, category_filter, location_filter):
+    clauses, params = [], {}
+
+    if filter_status in ['pending', 'verified', 'rejected']:
+        clauses.append("status = :status")
+        params['status'] = filter_status
+        if filter_status == 'pending':
+            clauses.append("active = 1")
+
+    if category_filter:
+        clauses.append("category_id = CAST(:category_id AS INTEGER)")
+        params['category_id'] = category_filter
+
+    if location_filter:
+        clauses.append("location_id = CAST(:location_id AS INTEGER)")
+        params['location_id'] = location_filter
+
+    return ''.join(' AND ' + clause for clause in clauses), params
+
+
+def search_professionals(search_query, filter_status=None, category_filter=None, location_filter=None,
+                         cursor=None, per_page=20):
+    """Professional ids matching search_query, best match first
+
+    Returns (ids, next_cursor). The cursor is the (bm25 rank, id) of the last row, so
+    later pages seek past it instead of re-ranking from the start.
+    """
+    expression = match_expression(search_query)
+    if not expression:
+        return [], None
+
+    where, params = _filters(filter_status, category_filter, location_filter)
+    params.update(expression=expression, limit=per_page + 1)
+
+    if cursor:
+        rank, last_id = decode_cursor(cursor, [db.Float(), db.Integer()])
+        where += " AND (bm25(professional_search) > :rank OR (bm25(professional_search) = :rank AND rowid > :last_id))"
+        params.update(rank=rank, last_id=last_id)
+
+    rows = db.session.execute(text(
+        "SELECT rowid, bm25(professional_search) AS rank FROM professional_search "
+        "WHERE professional_search MATCH :expression" + where +
+        " ORDER BY rank, rowid LIMIT :limit"
+    ), params).all()
+
+    if len(rows) <= per_page:
+        return [row.rowid for row in rows], None
+
+    rows = rows[:per_page]
+    return [row.rowid for row in rows], encode_cursor([rows[-1].rank, rows[-1].rowid])
+
+
+def count_search(search_query, filter_status=None, category_filter=None, location_filter=None):
+    expression = match_expression(search_query)
+    if not expression:
+        return 0
+
+    where, params = _filters(filter_status, category_filter, location_filter)
+    params['expression'] = expression
+    return db.session.execute(text(
+        "SELECT count(*) FROM professional_search WHERE professional_search MATCH :expression" + where
+    ), params).scalar()
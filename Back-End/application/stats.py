@@ -0,0 +1,108 @@
+from sqlalchemy import event, func, select
+from application.model import db, StatCounter, User, Service, Professional, Category, Location
+
+
+# totals use ref_id 0; the *_by_* metrics are keyed by the category / location id
+TOTALS = {
+    User: 'users',
+    Service: 'services',
+    Professional: 'professionals',
+    Category: 'categories',
+    Location: 'locations',
+}
+
+# model -> [(metric, foreign key attribute)]
+BREAKDOWNS = {
+    Service: [('services_by_category', 'category_id')],
+    Professional: [('professionals_by_category', 'category_id'), ('professionals_by_location', 'location_id')],
+}
+
+# a new category shows up in services_by_category even before it has services
+SEEDED = {
+    Category: 'services_by_category',
+}
+
+counters = StatCounter.__table__
+
+
+def _upsert(connection, metric, ref_id, delta):
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    statement = insert(counters).values(metric=metric, ref_id=ref_id or 0, value=delta)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[counters.c.metric, counters.c.ref_id],
+        set_={'value': counters.c.value + statement.excluded.value},
+    ))
+
+
+def _after_insert(mapper, connection, target):
+    _upsert(connection, TOTALS[type(target)], 0, 1)
+    for metric, attribute in BREAKDOWNS.get(type(target), []):
+        _upsert(connection, metric, getattr(target, attribute), 1)
+    if type(target) in SEEDED:
+        _upsert(connection, SEEDED[type(target)], target.id, 0)
+
+
+def _after_delete(mapper, connection, target):
+    _upsert(connection, TOTALS[type(target)], 0, -1)
+    for metric, attribute in BREAKDOWNS.get(type(target), []):
+        _upsert(connection, metric, getattr(target, attribute), -1)
+    if type(target) in SEEDED:
+        connection.execute(counters.delete().where(counters.c.metric == SEEDED[type(target)],
+                                                   counters.c.ref_id == target.id))
+
+
+def _after_update(mapper, connection, target):
+    # a professional moving city / category or a service moving category shifts one count
+    state = db.inspect(target)
+    for metric, attribute in BREAKDOWNS.get(type(target), []):
+        history = state.attrs[attribute].history
+        if history.has_changes() and history.deleted:
+            _upsert(connection, metric, history.deleted[0], -1)
+            _upsert(connection, metric, getattr(target, attribute), 1)
+
+
+# the counters are written on the flushing connection, so they commit or roll back with the row
+for model in TOTALS:
+    event.listen(model, 'after_insert', _after_insert)
+    event.listen(model, 'after_delete', _after_delete)
+for model in BREAKDOWNS:
+    event.listen(model, 'after_update', _after_update)
+
+
+def rebuild_stats(connection):
+    """Recount every metric from the source tables, used to backfill or repair drifted counters"""
+    connection.execute(counters.delete())
+
+    rows = []
+    for model, metric in TOTALS.items():
+        rows.append({'metric': metric, 'ref_id': 0,
+                     'value': connection.execute(select(func.count()).select_from(model.__table__)).scalar()})
+
+    for model, breakdowns in BREAKDOWNS.items():
+        for metric, attribute in breakdowns:
+            column = model.__table__.c[attribute]
+            for ref_id, value in connection.execute(select(column, func.count()).group_by(column)):
+                rows.append({'metric': metric, 'ref_id': ref_id or 0, 'value': value})
+
+    for model, metric in SEEDED.items():
+        present = {row['ref_id'] for row in rows if row['metric'] == metric}
+        for (ref_id,) in connection.execute(select(model.__table__.c.id)):
+            if ref_id not in present:
+                rows.append({'metric': metric, 'ref_id': ref_id, 'value': 0})
+
+    if rows:
+        connection.execute(counters.insert(), rows)
+
+
+def dashboard_counters():
+    """Every dashboard counter with the category / location name it refers to, in one query"""
+    return db.session.execute(
+        select(StatCounter.metric, StatCounter.ref_id, StatCounter.value, Category.name, Location.city)
+        .outerjoin(Category, (Category.id == StatCounter.ref_id) & StatCounter.metric.endswith('_by_category'))
+        .outerjoin(Location, (Location.id == StatCounter.ref_id) & StatCounter.metric.endswith('_by_location'))
+        .order_by(StatCounter.metric, StatCounter.ref_id)
+    ).all()
@@ -1,7 +1,8 @@
 
 from flask import current_app as app, render_template, request, jsonify
 from application.sec import datastore
-from werkzeug.security import check_password_hash
+from application.model import db
+from application.hashing import HashingBusy, RETRY_AFTER, hash_password, verify_password, needs_rehash
 from datetime import datetime
 
 
@@ -41,7 +42,13 @@ def user_login():
             "data": None
         }), 400
 
-    if check_password_hash(user.password, password):
+    if verify_password(user.password, password):
+        if needs_rehash(user.password):
+            try:
+                user.password = hash_password(password)
+                db.session.commit()
+            except HashingBusy:
+                pass    # the old hash still works; upgrade it on a later login
         return jsonify({
             "success": True,
             "message": "Login successful.",
@@ -57,3 +64,12 @@ def user_login():
             "message": "Incorrect password.",
             "data": None
         }), 400
+
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(e):
+    return jsonify({
+        "success": False,
+        "message": "Too many sign-ins right now. Please try again in a moment.",
+        "data": None
+    }), 503, {"Retry-After": str(RETRY_AFTER)}
@@ -0,0 +1,86 @@
+from inspect import unwrap
+from time import time
+from flask import current_app, request, url_for
+from kombu.exceptions import OperationalError
+from application.model import db, Category
+from application.caching import cache_entry, render_cacheable, Uncacheable, STALE_GRACE
+from application.catalog import catalog_cache, serviceability, bump_catalog_version, build_catalog_bundle
+
+
+# catalog views without path arguments; the per location and per category pages are listed from the data
+CATALOG_VIEWS = [
+    'common_bp.get_location',
+    'professional_bp.get_categories',
+    'professional_bp.get_locations',
+    'admin_bp.get_categories',
+    'admin_bp.get_locations',
+    'admin_bp.get_services',
+]
+
+DASHBOARD_VIEW = 'admin_bp.admin_dashboard'
+DASHBOARD_TIMEOUT = 60
+
+
+def _catalog_pages():
+    pages = [(endpoint, {}) for endpoint in CATALOG_VIEWS]
+    pages += [('common_bp.service_location', {'location_id': location_id})
+              for location_id in serviceability.matrix()]
+    pages += [('common_bp.get_services_by_category', {'category_id': category_id})
+              for category_id, in db.session.query(Category.id).filter_by(active=True)]
+    return pages
+
+
+def _render(endpoint, view_args):
+    """(cache key, (body, mimetype), cost) of a view, rendered as an anonymous GET without its decorators"""
+    with current_app.test_request_context():
+        path = url_for(endpoint, **view_args)
+
+    with current_app.test_request_context(path):
+        started = time()
+        value = render_cacheable(unwrap(current_app.view_functions[endpoint]), **view_args)
+        return request.full_path, value, time() - started
+
+
+def warm_catalog(version=None):
+    """Build every catalog page and the bundle for the version (default: current) and store them in one round trip"""
+    version = version or catalog_cache.version()
+    entries = {}
+    for endpoint, view_args in _catalog_pages():
+        try:
+            key, value, cost = _render(endpoint, view_args)
+        except Uncacheable:
+            continue
+        entries[key] = (value, cost)
+
+    started = time()
+    entries['bundle'] = (build_catalog_bundle(), time() - started)
+
+    catalog_cache.put_many(entries, version)
+    return len(entries)
+
+
+def warm_dashboard():
+    key, value, cost = _render(DASHBOARD_VIEW, {})
+    current_app.cache.set_many({'view:' + key: cache_entry(value, DASHBOARD_TIMEOUT, cost)},
+                               timeout=DASHBOARD_TIMEOUT + STALE_GRACE)
+
+
+def warm_caches():
+    """Prefill the catalog, serviceability and dashboard caches, e.g. after a deploy or a cache flush"""
+    warmed = warm_catalog()
+    warm_dashboard()
+    return warmed + 1
+
+
+def refresh_catalog():
+    """After an admin catalog edit: start a new catalog version and have a celery worker build it
+
+    Only the catalog pages and the bundle go stale on an edit, so only those are rebuilt, and off
+    the admin's request. Without a broker the pages are built on their first read instead.
+    """
+    bump_catalog_version()
+    from celery_tasks.tasks import warm_catalog_cache     # the tasks module imports this one
+    try:
+        warm_catalog_cache.apply_async((catalog_cache.version(),), retry=False)
+    except OperationalError:
+        pass
@@ -0,0 +1,104 @@
+"""Measure how long dispatch takes to pick a professional as a city grows.
+
+    python bench_dispatch.py [size ...]
+
+Runs on a scratch SQLite database in the temp directory (the configured one is not touched).
+For each size (default 1000, 10000, 100000) the database is refilled with that many verified,
+available professionals in a single location and category, and the script reports:
+
+- build:  DispatchIndex.build(), the full reload every worker does each REBUILD_INTERVAL
+- peek:   best candidate straight from the index, as the pending-request sweep does
+- find:   best candidate confirmed against its row in a fresh session, as a booking does
+- assign: find() plus the load update that re-ranks the professional after an assignment
+- sql:    the same pick as one ORDER BY query without the index, for comparison
+"""
+import os
+import sys
+import tempfile
+from random import Random
+from time import perf_counter
+
+import config
+
+SCRATCH_DB = os.path.join(tempfile.gettempdir(), 'bench_dispatch.sqlite3')
+config.DevelopmentConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + SCRATCH_DB
+config.DevelopmentConfig.CACHE_TYPE = 'SimpleCache'
+
+from main import db, app
+from sqlalchemy import insert
+from application.model import User, Location, Category, Professional
+from application.dispatch import DispatchIndex
+
+SIZES = [1000, 10000, 100000]
+PICKS = 1000
+LOCATION_ID, CATEGORY_ID = 1, 1
+
+
+def seed(size):
+    """A fresh database with size professionals in one bucket, ranked by random ratings and experience"""
+    random = Random(size)
+    db.drop_all()
+    db.create_all()
+    db.session.add(Location(city='Pune', state='Maharashtra'))
+    db.session.add(Category(name='Plumbing', description='Plumbing'))
+    db.session.execute(insert(User), [
+        {"id": i, "name": f"Professional {i}", "email": f"professional{i}@bench.test", "password": "-",
+         "mobile": f"9{i:09d}", "active": True, "fs_uniquifier": f"bench-{i}"}
+        for i in range(1, size + 1)
+    ])
+    db.session.execute(insert(Professional), [
+        {"user_id": i, "location_id": LOCATION_ID, "category_id": CATEGORY_ID, "status": "verified",
+         "available": True, "rating": round(random.uniform(1, 5), 1), "experience": random.randint(0, 15)}
+        for i in range(1, size + 1)
+    ])
+    db.session.commit()
+
+
+def per_call(fn, calls=PICKS):
+    """Mean microseconds per call of fn()"""
+    started = perf_counter()
+    for _ in range(calls):
+        fn()
+    return (perf_counter() - started) / calls * 1e6
+
+
+def fresh_find(index):
+    db.session.expunge_all()    # every booking runs in a new session
+    return index.find(LOCATION_ID, CATEGORY_ID)
+
+
+def assign(index):
+    professional = fresh_find(index)
+    index.assigned(professional.id)
+
+
+def sql_pick():
+    db.session.expunge_all()
+    return (
+        Professional.query
+        .join(User, User.id == Professional.user_id)
+        .filter(Professional.location_id == LOCATION_ID, Professional.category_id == CATEGORY_ID,
+                Professional.available == True, Professional.status == 'verified', User.active == True)
+        .order_by(Professional.rating.desc(), Professional.experience.desc())
+        .first()
+    )
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+
+    print(f"{'professionals':>13} {'build ms':>9} {'peek us':>8} {'find us':>8} {'assign us':>9} {'sql us':>8}")
+    with app.app_context():
+        for size in sizes:
+            seed(size)
+            index = DispatchIndex()
+
+            started = perf_counter()
+            index.build()
+            build_ms = (perf_counter() - started) * 1e3
+
+            peek = per_call(lambda: index.peek(LOCATION_ID, CATEGORY_ID))
+            find = per_call(lambda: fresh_find(index))
+            assigned = per_call(lambda: assign(index))
+            sql = per_call(sql_pick, calls=min(PICKS, 100))
+            print(f"{size:>13} {build_ms:>9.1f} {peek:>8.1f} {find:>8.1f} {assigned:>9.1f} {sql:>8.1f}")
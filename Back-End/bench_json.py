@@ -0,0 +1,66 @@
+"""Compare the JSON providers on a list-endpoint sized response.
+
+    python bench_json.py [rows]
+
+Encodes a payload shaped like the admin professional list ([rows] rows, default 5000, with
+datetimes, enums and Decimals) through app.json.response with Flask's own provider, the stdlib
+provider and the orjson provider, and prints the mean time per response. The stdlib and orjson
+bodies are parsed back and must be equal, or the script exits with status 1. Needs no database.
+"""
+import sys
+import json
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+from main import app
+from flask.json.provider import DefaultJSONProvider
+from application.json_provider import ORJSONProvider, StdlibJSONProvider, orjson
+from application.model import StatusEnum
+
+RUNS = 20
+
+
+def payload(rows):
+    return {
+        "data": [{
+            "id": i,
+            "name": f"Professional {i}",
+            "email": f"professional{i}@bench.test",
+            "rating": 4.5,
+            "experience": 3,
+            "status": StatusEnum.ASSIGNED,
+            "price": Decimal('499.50'),
+            "created_at": datetime(2025, 3, 1, 10, i % 60, 5, 123),
+            "category": "Plumbing",
+            "location": {"city": "Pune", "state": "Maharashtra"},
+            "available": True,
+        } for i in range(rows)],
+        "total": rows,
+    }
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    if orjson is None:
+        print("orjson is not installed, nothing to compare")
+        sys.exit(1)
+
+    app.debug = False   # debug responses are indented
+    body = payload(rows)
+    providers = {
+        "flask default": DefaultJSONProvider(app),
+        "stdlib": StdlibJSONProvider(app),
+        "orjson": ORJSONProvider(app),
+    }
+
+    with app.app_context():
+        stdlib_body = json.loads(providers["stdlib"].response(body).get_data())
+        orjson_body = json.loads(providers["orjson"].response(body).get_data())
+        if stdlib_body != orjson_body:
+            print("FAIL  the stdlib and orjson providers encode the payload differently")
+            sys.exit(1)
+
+        for name, provider in providers.items():
+            seconds = timeit.timeit(lambda: provider.response(body), number=RUNS) / RUNS
+            print(f"{name:<14} {seconds * 1e3:8.2f} ms per {rows}-row response")
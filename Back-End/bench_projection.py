@@ -0,0 +1,137 @@
+"""Compare the column-only list queries against loading ORM objects, at 100k rows.
+
+    python bench_projection.py [rows]
+
+Runs on a scratch SQLite database in the temp directory (the configured one is not touched),
+filled with [rows] users, professionals and services (default 100000). Each admin list is built
+twice: the way the routes used to, from ORM objects and their relationships, and the way they do
+now, from the Projection in admin_routes. The script prints the time and peak Python memory of
+both and exits with status 1 if their output differs. At the default size it takes a few minutes,
+most of it in the ORM professional list, which loads each row's user with a query of its own.
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import config
+
+SCRATCH_DB = os.path.join(tempfile.gettempdir(), 'bench_projection.sqlite3')
+config.DevelopmentConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + SCRATCH_DB
+config.DevelopmentConfig.CACHE_TYPE = 'SimpleCache'
+
+from main import db, app
+from sqlalchemy import insert
+from application.model import User, Role, role_user, Location, Category, Service, Professional
+from application.sec import datastore
+from application.routes.admin_routes import USER_ROWS, PROFESSIONAL_ROWS, SERVICE_ROWS
+from application.routes.admin_routes import filtered_users, filtered_professionals
+
+PAGE = 100
+
+
+def seed(rows):
+    db.drop_all()
+    db.create_all()
+    for name in ('admin', 'professional'):
+        datastore.find_or_create_role(name=name, description=name)
+    db.session.add_all([Location(city='Pune', state='Maharashtra'), Location(city='Delhi', state='Delhi')])
+    db.session.add_all([Category(name='Plumbing', description='Plumbing'), Category(name='Cleaning', description='Cleaning')])
+    db.session.commit()
+    datastore.create_user(name='Admin', email='admin@bench.test', password='-', mobile='9000000000', active=True,
+                          roles=['admin'])
+    db.session.commit()
+
+    start = datetime(2025, 1, 1)
+    db.session.execute(insert(User), [
+        {"id": i + 2, "name": f"Professional {i}", "email": f"professional{i}@bench.test", "password": "-",
+         "mobile": f"8{i:09d}", "active": i % 7 != 0, "fs_uniquifier": f"bench-{i}",
+         "created_at": start + timedelta(seconds=i)}
+        for i in range(rows)
+    ])
+    professional_role = Role.query.filter_by(name='professional').one()
+    db.session.execute(insert(role_user),
+                       [{"user_id": i + 2, "role_id": professional_role.id} for i in range(rows)])
+    db.session.execute(insert(Professional), [
+        {"user_id": i + 2, "category_id": 1 + i % 2, "location_id": 1 + i % 2, "experience": i % 20,
+         "status": "verified", "created_at": start + timedelta(seconds=i)}
+        for i in range(rows)
+    ])
+    db.session.execute(insert(Service), [
+        {"name": f"Service {i}", "description": "bench", "category_id": 1 + i % 2, "base_price": 100 + i % 900,
+         "created_at": start}
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+# the list bodies as the routes built them from ORM objects
+
+def orm_users(users):
+    return [{"id": u.id, "name": u.name, "email": u.email, "mobile": u.mobile, "active": u.active,
+             "role": u.roles[0].name if u.roles else None, "created_at": u.created_at, "updated_at": u.updated_at}
+            for u in users]
+
+
+def orm_professionals(professionals):
+    return [{"id": p.id, "name": p.user.name, "email": p.user.email, "mobile": p.user.mobile,
+             "experience": p.experience, "active": p.user.active, "status": p.status,
+             "category": p.category.name, "location": p.location.city}
+            for p in professionals]
+
+
+def orm_services(services):
+    return [{"id": s.id, "name": s.name, "description": s.description,
+             "image_url": s.image_url or "https://placehold.co/100x100",
+             "category_name": s.category.name if s.category else "N/A", "base_price": s.base_price,
+             "created_at": s.created_at.strftime('%Y-%m-%d %H:%M'),
+             "updated_at": s.updated_at.strftime('%Y-%m-%d %H:%M') if s.updated_at else "N/A", "active": s.active}
+            for s in services]
+
+
+CASES = [
+    ("services, every row",
+     lambda: orm_services(Service.query.order_by(Service.name).all()),
+     lambda: SERVICE_ROWS.dump_all(SERVICE_ROWS.query().order_by(Service.name).all())),
+    ("professionals, every row",
+     lambda: orm_professionals(filtered_professionals('all', '', '', '').order_by(Professional.id).all()),
+     lambda: PROFESSIONAL_ROWS.dump_all(
+         filtered_professionals('all', '', '', '', PROFESSIONAL_ROWS.query()).order_by(Professional.id).all())),
+    (f"users, {PAGE}-row page",
+     lambda: orm_users(filtered_users('', '').order_by(User.created_at, User.id).limit(PAGE).all()),
+     lambda: USER_ROWS.dump_all(
+         filtered_users('', '', USER_ROWS.query()).order_by(User.created_at, User.id).limit(PAGE).all())),
+]
+
+
+def measure(build):
+    """(rows, ms, peak MiB) of build() run in an empty session"""
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = perf_counter()
+    rows = build()
+    elapsed = perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return rows, elapsed * 1e3, peak / 2 ** 20
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    failed = 0
+    with app.app_context():
+        seed(size)
+        print(f"{'list':<26} {'loaded as':<10} {'ms':>9} {'peak MiB':>9} {'rows':>7}")
+        for name, orm, projection in CASES:
+            orm_rows, orm_ms, orm_peak = measure(orm)
+            projected_rows, projected_ms, projected_peak = measure(projection)
+            print(f"{name:<26} {'orm':<10} {orm_ms:>9.1f} {orm_peak:>9.1f} {len(orm_rows):>7}")
+            print(f"{name:<26} {'projection':<10} {projected_ms:>9.1f} {projected_peak:>9.1f} {len(projected_rows):>7}")
+            if orm_rows != projected_rows:
+                failed += 1
+                print(f"FAIL  {name}: the projection's output differs from the ORM's")
+
+    sys.exit(1 if failed else 0)
@@ -1,6 +1,6 @@
 from flask import current_app as app
 from celery.schedules import crontab
-from celery_tasks.tasks import send_daily_service_request_emails, send_monthly_service_request_emails
+from celery_tasks.tasks import send_daily_service_request_emails, send_monthly_service_request_emails, assign_pending_service_requests, recompute_professional_ratings
 
 
 celery_app = app.extensions["celery"]
@@ -20,3 +20,14 @@ def setup_periodic_tasks(sender, **kwargs):
     name="Monthly service request emails"
 )
 
+    sender.add_periodic_task(
+        crontab(minute='*/5'),
+        assign_pending_service_requests.s(),
+        name="Assign pending service requests"
+    )
+
+    sender.add_periodic_task(
+        crontab(hour=3, minute=0),
+        recompute_professional_ratings.s(),
+        name="Recompute professional ratings"
+    )
@@ -1,6 +1,12 @@
 from flask import render_template
 from celery import shared_task
-from application.model import Category, Professional, Location, User, db,ServiceRequest, StatusEnum
+from application.model import Category, Professional, Location, User, db,ServiceRequest, StatusEnum, Service, AssignRequest
+from application.dispatch import dispatch_index, rejected_by
+from application.ratings import recompute_ratings
+from application.bookings import refresh_bookings
+from application.caching import invalidate, bookings_tag, profile_tag, requests_tag
+from application.warmup import warm_caches, warm_catalog
+from sqlalchemy import insert, update, case
 import flask_excel as excel
 from datetime import datetime, timedelta
 from celery_tasks.mail_service import send_email
@@ -148,4 +154,102 @@ def send_monthly_service_request_emails():
                 body=email_body,
                 to_email=user.email
             )
-            print(f"Email sent to {user.email} with monthly service request summary.")
\ No newline at end of file
+            print(f"Email sent to {user.email} with monthly service request summary.")
+
+
+@shared_task(ignore_result=True)
+def assign_pending_service_requests(chunk_size=500):
+    """Assign PENDING service requests to professionals who have become available since they were booked."""
+    dispatch_index.build()  # start from the current state of the professional table
+
+    last_id = 0
+    assigned_total = 0
+    while True:
+        # keyset over the backlog so only one chunk is ever held in memory
+        chunk = (
+            db.session.query(ServiceRequest.id, ServiceRequest.location_id, Service.category_id)
+            .join(Service, Service.id == ServiceRequest.service_id)
+            .filter(ServiceRequest.status == StatusEnum.PENDING, ServiceRequest.id > last_id)
+            .order_by(ServiceRequest.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        rejected = rejected_by([row.id for row in chunk])
+
+        matches = {}
+        for request_id, location_id, category_id in chunk:
+            professional_id = dispatch_index.peek(location_id, category_id, exclude=rejected.get(request_id, ()))
+            if professional_id is not None:
+                matches[request_id] = professional_id
+                dispatch_index.assigned(professional_id)
+        if not matches:
+            continue
+
+        # one UPDATE for the whole chunk; requests cancelled since the SELECT are left alone
+        applied_rows = db.session.execute(
+            update(ServiceRequest)
+            .where(ServiceRequest.id.in_(matches), ServiceRequest.status == StatusEnum.PENDING)
+            .values(professional_id=case(matches, value=ServiceRequest.id), status=StatusEnum.ASSIGNED,
+                    version_id=ServiceRequest.version_id + 1)
+            .returning(ServiceRequest.id, ServiceRequest.user_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        applied = [request_id for request_id, _ in applied_rows]
+
+        # bump the professionals' assignment counters so concurrent bookings that read them retry elsewhere
+        db.session.execute(
+            update(Professional)
+            .where(Professional.id.in_({matches[request_id] for request_id in applied}))
+            .values(assign_version=Professional.assign_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+        now = datetime.now(IST)
+        if applied:
+            db.session.execute(insert(AssignRequest), [
+                {"service_request_id": request_id, "professional_id": matches[request_id],
+                 "status": StatusEnum.ASSIGNED, "assign_date": now}
+                for request_id in applied
+            ])
+            refresh_bookings(db.session.connection(), applied)
+        db.session.commit()
+
+        for request_id in set(matches) - set(applied):
+            dispatch_index.released(matches[request_id])
+
+        # customers see the assignment and professionals the new job on their next read
+        if applied:
+            professional_user_ids = db.session.query(Professional.user_id).filter(
+                Professional.id.in_({matches[request_id] for request_id in applied})).all()
+            invalidate(*{bookings_tag(user_id) for _, user_id in applied_rows},
+                       *{requests_tag(user_id) for user_id, in professional_user_ids})
+        assigned_total += len(applied)
+
+    print(f"Assigned {assigned_total} pending service requests.")
+    return assigned_total
+
+
+@shared_task(ignore_result=True)
+def recompute_professional_ratings():
+    """Recompute every professional's rating from the stored reviews to correct drift in the running aggregates."""
+    user_ids = recompute_ratings()
+    dispatch_index.build()
+    # the profile shows the rating, as record_review's callers invalidate it
+    invalidate(*[profile_tag(user_id) for user_id in user_ids])
+    return len(user_ids)
+
+
+@shared_task(ignore_result=True)
+def warm_up_caches():
+    """Prefill the catalog, serviceability and dashboard caches, e.g. after a deploy or a Redis flush."""
+    return warm_caches()
+
+
+@shared_task(ignore_result=True)
+def warm_catalog_cache(version):
+    """Build the catalog pages for the version an admin edit just started, see warmup.refresh_catalog."""
+    return warm_catalog(version)
@@ -0,0 +1,108 @@
+"""Fail when a hot route query falls back to a full table scan.
+
+Run against a seeded database. create_db.py builds the current schema with db.create_all(), so
+mark it as migrated instead of upgrading it (the first migration alters tables create_all has
+already built in their final shape and would fail):
+
+    python create_db.py
+    flask --app main db stamp head
+    python check_query_plans.py
+
+An existing database that is already under migrations only needs flask --app main db upgrade.
+
+Every query below is one issued by a route, the dispatcher or a celery task, built through the
+same helpers where the route has them; keyset paginated lists are checked on their first page
+and on a later one, which adds the cursor's seek condition. Each one is compiled for the
+configured engine and run through EXPLAIN QUERY PLAN; a plain "SCAN <table>" step means SQLite
+reads the whole table and the check exits with status 1.
+"""
+import sys
+from datetime import datetime
+from main import db, app
+from sqlalchemy.sql import func
+from application.model import User, Role, role_user, UserAddress, Service, Professional
+from application.model import ServiceRequest, AssignRequest, BookingView, StatusEnum
+from application.pagination import encode_cursor, keyset_page_query
+from application.routes.user_routes import BOOKING_ROWS
+from application.routes.professional_routes import assigned_requests_query
+from application.routes.admin_routes import USER_ROWS, PROFESSIONAL_ROWS, filtered_users, filtered_professionals
+
+
+def keyset_pages(name, query, columns, descending=False):
+    """The first page and a later one of a keyset paginated list, as the route builds them"""
+    cursor = encode_cursor([datetime(2025, 1, 1) if column.type.python_type is datetime else 1 for column in columns])
+    return {
+        f"{name} (first page)": keyset_page_query(query, columns, descending=descending),
+        f"{name} (next page)": keyset_page_query(query, columns, cursor, descending=descending),
+    }
+
+
+def route_queries():
+    user_id, professional_id, location_id, category_id, service_id, request_id = 1, 1, 1, 1, 1, 1
+    open_statuses = [StatusEnum.PENDING, StatusEnum.ACCEPTED, StatusEnum.ASSIGNED]
+
+    return {
+        "auth: user by token": User.query.filter_by(fs_uniquifier='token'),
+        "auth: user by email": User.query.filter_by(email='admin@email.com'),
+        "auth: roles of user": db.session.query(Role).join(role_user, role_user.c.role_id == Role.id)
+                                .filter(role_user.c.user_id == user_id),
+
+        "user: user_address": UserAddress.query.filter_by(user_id=user_id),
+        "user: book_service active request": ServiceRequest.query.filter(
+            ServiceRequest.user_id == user_id, ServiceRequest.service_id == service_id,
+            ServiceRequest.status.in_(open_statuses)),
+        **keyset_pages("user: get_bookings",
+                       BOOKING_ROWS.query(BookingView.request_date).filter(BookingView.user_id == user_id),
+                       [BookingView.request_date, BookingView.id], descending=True),
+        "user: cancel_booking": ServiceRequest.query.filter(ServiceRequest.user_id == user_id,
+                                                            ServiceRequest.id == request_id),
+
+        "professional: profile": Professional.query.filter_by(user_id=user_id),
+        "professional: get_request": assigned_requests_query(professional_id),
+
+        **keyset_pages("admin: users", filtered_users('', '', USER_ROWS.query()), [User.created_at, User.id]),
+        **keyset_pages("admin: professionals",
+                       filtered_professionals('all', '', '', '', PROFESSIONAL_ROWS.query(Professional.created_at)),
+                       [Professional.created_at, Professional.id]),
+
+        "common: services by category": Service.query.filter_by(category_id=category_id, active=True),
+
+        "dispatch: open requests of professional": db.session.query(func.count(AssignRequest.id)).filter(
+            AssignRequest.professional_id == professional_id,
+            AssignRequest.status.in_([StatusEnum.ASSIGNED, StatusEnum.ACCEPTED])),
+        "dispatch: rejected by": db.session.query(AssignRequest.service_request_id, AssignRequest.professional_id)
+                                  .filter(AssignRequest.service_request_id.in_([request_id]),
+                                          AssignRequest.status == StatusEnum.REJECTED),
+        "dispatch: waitlist load": db.session.query(ServiceRequest.id)
+                                    .join(Service, Service.id == ServiceRequest.service_id)
+                                    .filter(ServiceRequest.status == StatusEnum.PENDING,
+                                            ServiceRequest.location_id == location_id,
+                                            Service.category_id == category_id)
+                                    .order_by(ServiceRequest.id),
+        "tasks: pending sweep chunk": db.session.query(ServiceRequest.id, ServiceRequest.location_id, Service.category_id)
+                                       .join(Service, Service.id == ServiceRequest.service_id)
+                                       .filter(ServiceRequest.status == StatusEnum.PENDING, ServiceRequest.id > 0)
+                                       .order_by(ServiceRequest.id)
+                                       .limit(500),
+    }
+
+
+def full_scans(query):
+    statement = query.statement if hasattr(query, 'statement') else query
+    sql = str(statement.compile(dialect=db.engine.dialect, compile_kwargs={"literal_binds": True}))
+    plan = db.session.execute(db.text("EXPLAIN QUERY PLAN " + sql)).all()
+    return [row[-1] for row in plan if row[-1].startswith('SCAN ') and ' USING ' not in row[-1]]
+
+
+with app.app_context():
+    failed = 0
+    for name, query in route_queries().items():
+        scans = full_scans(query)
+        if scans:
+            failed += 1
+            print(f"FAIL  {name}: {'; '.join(scans)}")
+        else:
+            print(f"ok    {name}")
+
+    print(f"{failed} of {len(route_queries())} queries fall back to a full table scan")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,103 @@
+"""Fail when /api/professional/get-requests issues more SQL for more assignments.
+
+    python check_statement_counts.py [assignments]
+
+Runs on a scratch SQLite database in the temp directory (the configured one is not touched).
+One professional holds a single assignment, another holds [assignments] of them (default 50),
+each for a different customer and service. Both fetch their list once, uncached, and every
+statement sent to the database during the request is counted with a before_cursor_execute
+listener. The two counts must be equal: the list is one query whatever its length, and a
+per-row lazy load would add a statement per assignment. Exits with status 1 otherwise.
+"""
+import os
+import sys
+import tempfile
+
+import config
+
+SCRATCH_DB = os.path.join(tempfile.gettempdir(), 'check_statement_counts.sqlite3')
+config.DevelopmentConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + SCRATCH_DB
+config.DevelopmentConfig.CACHE_TYPE = 'SimpleCache'
+
+from main import db, app
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from application.model import Location, Category, Service, Professional, UserAddress
+from application.model import ServiceRequest, AssignRequest, StatusEnum
+from application.sec import datastore
+
+
+def seed(assignments):
+    """Tokens of a professional with one assignment and of one with the given number"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in ('user', 'professional'):
+            datastore.find_or_create_role(name=name, description=name)
+        db.session.commit()
+
+        password = generate_password_hash('statements')
+        professionals = [datastore.create_user(name=f'Professional {i}', email=f'professional{i}@statements.test',
+                                               password=password, mobile=f'91{i:08d}', active=True, roles=['professional'])
+                         for i in range(2)]
+        customers = [datastore.create_user(name=f'Customer {i}', email=f'customer{i}@statements.test',
+                                           password=password, mobile=f'92{i:08d}', active=True, roles=['user'])
+                     for i in range(assignments + 1)]
+        db.session.add(Location(city='Pune', state='Maharashtra'))
+        db.session.add(Category(name='Plumbing', description='Plumbing'))
+        db.session.commit()
+
+        db.session.add_all(Professional(user_id=user.id, category_id=1, location_id=1, status='verified')
+                           for user in professionals)
+        db.session.add_all(Service(name=f'Service {i}', description='statements', category_id=1, base_price=100)
+                           for i in range(assignments + 1))
+        db.session.add_all(UserAddress(user_id=user.id, address='statements', location_id=1, pincode='411001')
+                           for user in customers)
+        db.session.commit()
+
+        # customer 0 books the single professional's job, every other customer one of the busy professional's
+        for i, customer in enumerate(customers):
+            professional_id = 1 if i == 0 else 2
+            booking = ServiceRequest(user_id=customer.id, service_id=i + 1, location_id=1, professional_id=professional_id,
+                                     total_price=100, status=StatusEnum.ASSIGNED)
+            db.session.add(booking)
+            db.session.flush()
+            db.session.add(AssignRequest(service_request_id=booking.id, professional_id=professional_id,
+                                         status=StatusEnum.ASSIGNED))
+        db.session.commit()
+
+        return [{'Authentication-Token': user.get_auth_token()} for user in professionals]
+
+
+def count_statements(client, headers):
+    """Number of statements sent to the database while serving one get-requests call, and its rows"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/api/professional/get-requests', headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200, response.data
+    return len(statements), len(response.get_json())
+
+
+if __name__ == '__main__':
+    assignments = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    single, busy = seed(assignments)
+    client = app.test_client()
+    single_count, single_rows = count_statements(client, single)
+    busy_count, busy_rows = count_statements(client, busy)
+
+    print(f"{single_count} statements for {single_rows} assignment")
+    print(f"{busy_count} statements for {busy_rows} assignments")
+    if single_count != busy_count:
+        print("FAIL  get-requests issues more statements for more assignments")
+        sys.exit(1)
+    print("ok    statement count does not depend on the number of assignments")
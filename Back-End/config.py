@@ -8,6 +8,14 @@ class Config:
     WTF_CSRF_ENABLED = False
     SECURITY_TOKEN_AUTHENTICATION_HEADER = 'Authentication-Token'
 
+    # prefill the catalog and dashboard caches when the app starts (needs the database and the cache up)
+    CACHE_WARM_ON_START = False
+
+    # password hashes run in this many worker processes; past PASSWORD_HASH_QUEUE waiting
+    # requests, logins and registrations get a 503 instead of tying up the web workers
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE = 8
+
 class DevelopmentConfig(Config):
     DEBUG = True
     TESTING = True
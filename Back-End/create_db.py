@@ -2,6 +2,7 @@ from main import db, app
 from sqlalchemy import select
 from application.model import *
 from application.sec import datastore
+from application.catalog import bump_catalog_version
 from faker import Faker
 from werkzeug.security import generate_password_hash
 import csv
@@ -187,4 +188,7 @@ def insert_categories_and_services():
 with app.app_context():
     insert_categories_and_services()
 
+    # cached catalog responses and serviceability masks belong to the data that was just dropped
+    bump_catalog_version()
+
 print("Data inserted successfully!")
@@ -3,6 +3,8 @@ from config import DevelopmentConfig
 from application.model import StatusEnum, db, IST, User,Role, role_user, Location, Category, Professional, UserAddress
 from application.model import Service, ServiceLocation, ServiceRequest, Payment, AssignRequest, ServiceReview, ProfessionalReview
 from application.sec import datastore
+from application.auth_cache import load_user_from_token
+from application.json_provider import init_json
 from flask_security import Security
 import flask_cors as cors
 from flask_mail import Mail
@@ -23,7 +25,9 @@ def create_app():
     app.config['BUNDLE_ERRORS'] = True
 
     cache = Cache(app)
+    init_json(app)
     app.security = Security(app, datastore)
+    app.login_manager.request_loader(load_user_from_token)
 
     db.init_app(app)
     migrate.init_app(app, db)
@@ -54,6 +58,10 @@ def create_app():
         app.register_blueprint(common_routes.common_bp, url_prefix='/api/common')
         app.register_blueprint(celery_routes.celery_tasks_bp, url_prefix='/api/celery')
 
+        if app.config['CACHE_WARM_ON_START']:
+            from application.warmup import warm_caches
+            warm_caches()
+
 
     return app, celery_app
 
@@ -0,0 +1,37 @@
+"""professional search index
+
+Revision ID: f06a9d17c3e2
+Revises: e3b8c2d06f51
+Create Date: 2026-10-18 13:05:12.640388
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from application.search import CREATE_INDEX_TABLE, CREATE_TRIGGERS, DROP_INDEX_TABLE, TRIGGER_NAMES, rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = 'f06a9d17c3e2'
+down_revision = 'e3b8c2d06f51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite only; other databases keep the LIKE search in admin_routes.filtered_professionals
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(CREATE_INDEX_TABLE)
+    for statement in CREATE_TRIGGERS:
+        op.execute(statement)
+    rebuild_search_index(op.get_bind())
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for trigger in TRIGGER_NAMES:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute(DROP_INDEX_TABLE)
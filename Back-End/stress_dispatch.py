@@ -0,0 +1,172 @@
+"""Book services and edit professionals from several processes at once, then check the invariants.
+
+    python stress_dispatch.py [workers] [rounds]
+
+Runs on a scratch SQLite database in the temp directory (the configured one is not touched).
+Half the workers book random services as random customers while the other half keep toggling
+the availability and verification of the professionals those bookings go to. Fails with
+status 1 when any of these break:
+
+- no booking is held by more than one open assignment, and every ASSIGNED booking has one
+- no customer has two open requests for the same service
+- no request ends in a 500, and the professional edits are never refused as stale
+  (dispatch.claim bumps Professional.assign_version, not the version_id the edits are checked against)
+"""
+import os
+import sys
+import random
+import tempfile
+from multiprocessing import get_context
+
+import config
+
+SCRATCH_DB = os.path.join(tempfile.gettempdir(), 'stress_dispatch.sqlite3')
+config.DevelopmentConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + SCRATCH_DB
+config.DevelopmentConfig.CACHE_TYPE = 'SimpleCache'    # one cache per process; every check below reads the database
+
+from main import db, app
+from sqlalchemy.sql import func
+from werkzeug.security import generate_password_hash
+from application.model import Location, Category, Service, ServiceLocation, Professional, UserAddress
+from application.model import ServiceRequest, AssignRequest, StatusEnum
+from application.sec import datastore
+
+PROFESSIONALS = 4
+CUSTOMERS = 8
+SERVICES = 200
+OPEN_STATUSES = [StatusEnum.PENDING, StatusEnum.ASSIGNED, StatusEnum.ACCEPTED]
+
+
+def seed():
+    """Tokens for the admin, the professionals and the customers of a fresh scratch database"""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in ('admin', 'user', 'professional'):
+            datastore.find_or_create_role(name=name, description=name)
+        db.session.commit()
+
+        password = generate_password_hash('stress')
+        admin = datastore.create_user(name='Admin', email='admin@stress.test', password=password,
+                                      mobile='9000000000', active=True, roles=['admin'])
+        professionals = [datastore.create_user(name=f'Professional {i}', email=f'professional{i}@stress.test',
+                                               password=password, mobile=f'91{i:08d}', active=True, roles=['professional'])
+                         for i in range(PROFESSIONALS)]
+        customers = [datastore.create_user(name=f'Customer {i}', email=f'customer{i}@stress.test',
+                                           password=password, mobile=f'92{i:08d}', active=True, roles=['user'])
+                     for i in range(CUSTOMERS)]
+        db.session.add(Location(city='Pune', state='Maharashtra'))
+        db.session.add(Category(name='Plumbing', description='Plumbing'))
+        db.session.commit()
+
+        db.session.add(ServiceLocation(location_id=1, category_id=1))
+        db.session.add_all(Service(name=f'Service {i}', description='stress', category_id=1, base_price=100)
+                           for i in range(SERVICES))
+        db.session.add_all(Professional(user_id=user.id, category_id=1, location_id=1, experience=i, rating=4,
+                                        status='verified') for i, user in enumerate(professionals))
+        db.session.add_all(UserAddress(user_id=user.id, address='stress', location_id=1, pincode='411001')
+                           for user in customers)
+        db.session.commit()
+
+        def token(user):
+            return {'Authentication-Token': user.get_auth_token()}
+
+        return (token(admin), [token(user) for user in professionals],
+                [token(user) for user in customers], [professional.id for professional in Professional.query.all()])
+
+
+def book(seed_, rounds, customers):
+    random.seed(seed_)
+    client = app.test_client()
+    codes = {}
+    for _ in range(rounds):
+        response = client.post(f'/api/user/book_service/{random.randint(1, SERVICES)}',
+                               json={'price': 100}, headers=random.choice(customers))
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+    return 'book', codes
+
+
+def edit(rounds, admin, professional, professional_id):
+    """Toggle one professional back and forth; no other worker edits them, so nothing here may be stale"""
+    client = app.test_client()
+    codes = {}
+    for i in range(rounds):
+        if i % 10 in (4, 5):
+            # a rejection and the approval right after it, so the professional is out of dispatch only briefly
+            response = client.post(f'/api/admin/update_professional_status/{professional_id}',
+                                   json={'status': 'rejected' if i % 10 == 4 else 'verified'}, headers=admin)
+        else:
+            response = client.put('/api/professional/update-availability', headers=professional)
+        codes[response.status_code] = codes.get(response.status_code, 0) + 1
+    return 'edit', codes
+
+
+def run(job):
+    kind, args = job
+    return book(*args) if kind == 'book' else edit(*args)
+
+
+def violations():
+    found = []
+    with app.app_context():
+        double = (
+            db.session.query(AssignRequest.service_request_id)
+            .filter(AssignRequest.status.in_([StatusEnum.ASSIGNED, StatusEnum.ACCEPTED]))
+            .group_by(AssignRequest.service_request_id)
+            .having(func.count() > 1)
+            .all()
+        )
+        found += [f"booking {request_id} has more than one open assignment" for request_id, in double]
+
+        unassigned = (
+            db.session.query(ServiceRequest.id)
+            .outerjoin(AssignRequest, (AssignRequest.service_request_id == ServiceRequest.id)
+                       & (AssignRequest.status == StatusEnum.ASSIGNED))
+            .filter(ServiceRequest.status == StatusEnum.ASSIGNED, AssignRequest.id == None)
+            .all()
+        )
+        found += [f"booking {request_id} is ASSIGNED without an assignment" for request_id, in unassigned]
+
+        duplicates = (
+            db.session.query(ServiceRequest.user_id, ServiceRequest.service_id)
+            .filter(ServiceRequest.status.in_(OPEN_STATUSES))
+            .group_by(ServiceRequest.user_id, ServiceRequest.service_id)
+            .having(func.count() > 1)
+            .all()
+        )
+        found += [f"customer {user_id} has two open requests for service {service_id}" for user_id, service_id in duplicates]
+    return found
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+
+    admin, professionals, customers, professional_ids = seed()
+    editors = min(workers // 2, PROFESSIONALS)
+    jobs = [('edit', (rounds, admin, professionals[i], professional_ids[i])) for i in range(editors)]
+    jobs += [('book', (i, rounds, customers)) for i in range(workers - editors)]
+
+    with get_context('spawn').Pool(workers) as pool:
+        results = pool.map(run, jobs)
+
+    totals = {'book': {}, 'edit': {}}
+    for kind, codes in results:
+        for code, n in codes.items():
+            totals[kind][code] = totals[kind].get(code, 0) + n
+    print(f"bookings: {totals['book']}")
+    print(f"professional edits: {totals['edit']}")
+
+    problems = violations()
+    if any(code >= 500 for codes in totals.values() for code in codes):
+        problems.append("some requests failed with a server error")
+    if set(totals['edit']) - {200}:
+        problems.append("some professional edits were refused")
+    with app.app_context():
+        print(f"{ServiceRequest.query.count()} bookings, "
+              f"{ServiceRequest.query.filter_by(status=StatusEnum.ASSIGNED).count()} assigned")
+
+    for problem in problems:
+        print(f"FAIL  {problem}")
+    print(f"{len(problems)} problems")
+    sys.exit(1 if problems else 0)
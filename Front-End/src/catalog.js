@@ -0,0 +1,37 @@
+import api from './api'
+
+const STORAGE_KEY = 'catalog'
+
+let pending = null
+
+// Locations, categories, services and serviceability from one versioned bundle.
+// The stored copy is revalidated with ?version=; the server answers 304 while it is current.
+const fetchCatalog = async () => {
+    const stored = JSON.parse(localStorage.getItem(STORAGE_KEY) || 'null')
+    const response = await api.get('/api/common/catalog', {
+        params: { version: stored?.version },
+        validateStatus: (status) => status === 200 || status === 304,
+    })
+    if (response.status === 304 && stored) return stored
+
+    localStorage.setItem(STORAGE_KEY, JSON.stringify(response.data))
+    return response.data
+}
+
+// components mounted together share one request
+export const loadCatalog = () => {
+    if (!pending) {
+        pending = fetchCatalog().finally(() => {
+            pending = null
+        })
+    }
+    return pending
+}
+
+export const categoriesAt = (catalog, locationId) => {
+    const served = catalog.serviceability[locationId] || []
+    return catalog.categories.filter((category) => served.includes(category.id))
+}
+
+export const servicesOf = (catalog, categoryId) =>
+    catalog.services.filter((service) => service.category_id === Number(categoryId))